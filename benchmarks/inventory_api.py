@@ -0,0 +1,177 @@
+"""
+Latency, throughput and query-count benchmarks for the inventory API.
+
+    python benchmarks/inventory_api.py --seed --driver inprocess --output before.json
+    python benchmarks/inventory_api.py --driver http --output before-http.json
+
+--seed bulk-inserts a realistic dataset (by default 50k products, 2M
+batches and 5M sales) into the configured database first, so point the
+project at a scratch database. The in-process driver calls the views
+through Django's test client and counts queries per request. The HTTP
+driver goes through a local gunicorn. Results are written as JSON so runs
+can be diffed across commits.
+"""
+import argparse
+import http.client
+import json
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import HOST, git_commit, gunicorn_server, setup_django, summarize
+
+
+def scenarios(product_ids, rng, sell_lines):
+    """
+    Request factories per scenario: each call returns `(method, path, body)`.
+    """
+    def create_product():
+        return 'POST', '/api/products/', {
+            "product_name": f"Benchmark product {rng.random()}",
+            "cost_price": "10.00",
+            "category": "food",
+            "unit_measurements": [{"unit_type": "piece", "selling_price": "15.00"},
+                                  {"unit_type": "carton", "selling_price": "200.00"}],
+        }
+
+    def add_quantity():
+        return 'POST', f'/api/products/{rng.choice(product_ids)}/add-quantity/', {
+            "cost_price": "9.50", "quantity": 20}
+
+    def sell():
+        return 'POST', '/api/products/sell/', {"products": [
+            {"product_id": product_id, "unit_type": "piece", "quantity": 1, "selling_price": "15.00"}
+            for product_id in rng.sample(product_ids, sell_lines)
+        ]}
+
+    def sales_history():
+        return 'GET', '/api/sales-history/', None
+
+    def batch_listing():
+        return 'GET', f'/api/products/{rng.choice(product_ids)}/product-batches/', None
+
+    return {
+        'create-product': create_product,
+        'add-quantity': add_quantity,
+        'multi-line-sell': sell,
+        'sales-history': sales_history,
+        'batch-listing': batch_listing,
+    }
+
+
+def run_inprocess(make_request, iterations):
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client(SERVER_NAME=HOST)
+    latencies, queries, errors = [], [], 0
+    started_at = time.perf_counter()
+    for _ in range(iterations):
+        method, path, body = make_request()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            if method == 'GET':
+                response = client.get(path)
+            else:
+                response = client.post(path, json.dumps(body), content_type='application/json')
+            elapsed = time.perf_counter() - started
+        if response.status_code < 400:
+            latencies.append(elapsed)
+            queries.append(len(captured))
+        else:
+            errors += 1
+
+    result = summarize(latencies, errors, time.perf_counter() - started_at)
+    result["queries_per_request"] = round(sum(queries) / len(queries), 1) if queries else None
+    return result
+
+
+def run_http(make_request, iterations, port, concurrency):
+    def one(_):
+        method, path, body = make_request()
+        connection = http.client.HTTPConnection(HOST, port, timeout=60)
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=json.dumps(body) if body is not None else None,
+                               headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            ok = response.status < 400
+        except OSError:
+            ok = False
+        finally:
+            connection.close()
+        return ok, time.perf_counter() - started
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one, range(iterations)))
+    latencies = [elapsed for ok, elapsed in outcomes if ok]
+    result = summarize(latencies, len(outcomes) - len(latencies), time.perf_counter() - started_at)
+    result["queries_per_request"] = None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--driver', choices=['inprocess', 'http'], default='inprocess')
+    parser.add_argument('--scenario', action='append', help="Only run these scenarios (repeatable).")
+    parser.add_argument('--iterations', type=int, default=200, help="Requests per scenario.")
+    parser.add_argument('--sell-lines', type=int, default=10, help="Lines per sell basket.")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent clients for the HTTP driver.")
+    parser.add_argument('--workers', type=int, default=4, help="Gunicorn workers for the HTTP driver.")
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--seed', action='store_true', help="Seed the dataset before measuring.")
+    parser.add_argument('--products', type=int, default=50_000)
+    parser.add_argument('--batches-per-product', type=int, default=40)
+    parser.add_argument('--sales-per-product', type=int, default=100)
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args()
+
+    setup_django()
+    from product.models import Product, ProductBatch, SalesRecord
+    from product.seeding import seed_dataset
+
+    if args.seed:
+        started = time.perf_counter()
+        seed_dataset(args.products, args.batches_per_product, args.sales_per_product)
+        print(f"Seeded in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    product_ids = list(Product.objects.filter(total_quantity__gt=0).values_list('pk', flat=True)[:10_000])
+    if len(product_ids) < args.sell_lines:
+        parser.error("not enough stocked products; run with --seed first")
+
+    factories = scenarios(product_ids, random.Random(0), args.sell_lines)
+    selected = args.scenario or list(factories)
+
+    results = {}
+    if args.driver == 'inprocess':
+        for name in selected:
+            results[name] = run_inprocess(factories[name], args.iterations)
+    else:
+        app_args = ['product_project.wsgi:application', '-k', 'sync']
+        with gunicorn_server(app_args, args.workers, args.port):
+            for name in selected:
+                results[name] = run_http(factories[name], args.iterations, args.port, args.concurrency)
+
+    report = {
+        "commit": git_commit(),
+        "driver": args.driver,
+        "dataset": {
+            "products": Product.objects.count(),
+            "batches": ProductBatch.objects.count(),
+            "sales": SalesRecord.objects.count(),
+        },
+        "iterations": args.iterations,
+        "scenarios": results,
+    }
+    output = open(args.output, 'w') if args.output else sys.stdout
+    with output:
+        json.dump(report, output, indent=2)
+        output.write("\n")
+
+
+if __name__ == '__main__':
+    main()
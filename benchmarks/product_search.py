@@ -0,0 +1,118 @@
+"""
+Latency of product search: the indexed search endpoint against matching
+the same queries with a LIKE scan of the product table.
+
+    python benchmarks/product_search.py --seed --products 100000
+
+--seed bulk-inserts a catalogue of made-up multi-word product names into
+the configured database, so point the project at a scratch database. Each
+query is a random word prefix of at least three characters, sometimes
+followed by the prefix of a second word, as a cashier types them. The search endpoint is called in-process
+through Django's test client, so the numbers include serializing the page;
+the scan is timed on the id lookup alone.
+"""
+import argparse
+import json
+import random
+import time
+
+from common import HOST, git_commit, setup_django, summarize
+
+SYLLABLES = ["ba", "ce", "di", "fo", "gu", "ka", "le", "mi", "no", "pa", "ra", "se", "ti", "vo", "xa", "zu",
+             "mol", "tan", "rex", "lin", "cor", "pha", "sol", "ben"]
+SIZES = ["100mg", "250mg", "500mg", "1kg", "5kg", "50ml", "500ml", "1l", "pack of 10", "carton"]
+
+
+def vocabulary(rng, words):
+    vocab = set()
+    while len(vocab) < words:
+        vocab.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(vocab)
+
+
+def seed_catalogue(products, vocab, rng):
+    from decimal import Decimal
+    from django.db import transaction
+    from product.models import PRODUCT_CATEGORY, Product
+
+    categories = [value for value, _ in PRODUCT_CATEGORY]
+    for start in range(0, products, 5000):
+        with transaction.atomic():
+            Product.objects.bulk_create([
+                Product(product_name=" ".join([*(rng.choice(vocab).capitalize() for _ in range(rng.randint(1, 3))),
+                                               rng.choice(SIZES)]),
+                        cost_price=Decimal(rng.randint(100, 10000)) / 100,
+                        category=rng.choice(categories))
+                for _ in range(start, min(start + 5000, products))
+            ])
+
+
+def queries(vocab, count, rng, min_prefix):
+    typed = []
+    for _ in range(count):
+        words = [rng.choice(vocab)[:rng.randint(min_prefix, 5)]]
+        if rng.random() < 0.3:
+            words.append(rng.choice(vocab)[:rng.randint(2, 4)])
+        typed.append(" ".join(words))
+    return typed
+
+
+def measure(run, typed):
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for query in typed:
+        request_started = time.perf_counter()
+        if not run(query):
+            errors += 1
+        latencies.append(time.perf_counter() - request_started)
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=100_000, help="Products to seed.")
+    parser.add_argument('--words', type=int, default=5000, help="Distinct words product names are built from.")
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--scan-queries', type=int, default=50, dest='scan_queries',
+                        help="Queries to time the LIKE scan with; it is much slower.")
+    parser.add_argument('--seed', action='store_true', help="Seed the catalogue before measuring.")
+    parser.add_argument('--random-seed', type=int, default=0, dest='random_seed')
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.test import Client
+    from product.models import Product
+    from product.search import SEARCH_MIN_PREFIX, _scan_search, search_backend, search_terms
+
+    rng = random.Random(args.random_seed)
+    vocab = vocabulary(rng, args.words)
+    if args.seed:
+        seed_catalogue(args.products, vocab, rng)
+    typed = queries(vocab, args.queries, rng, SEARCH_MIN_PREFIX)
+
+    client = Client(SERVER_NAME=HOST)
+    client.get('/api/products/search/', {'q': typed[0]})
+    report = {
+        "commit": git_commit(),
+        "database": connection.vendor,
+        "backend": search_backend().__name__.strip('_'),
+        "products": Product.objects.count(),
+        "search_endpoint": measure(
+            lambda query: client.get('/api/products/search/', {'q': query}).status_code == 200, typed),
+        "like_scan": measure(
+            lambda query: _scan_search(search_terms(query), None, 20) is not None, typed[:args.scan_queries]),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Compare the sync (WSGI, gunicorn sync workers) and async (ASGI, uvicorn
+workers) read endpoints under load against a local database.
+
+    python benchmarks/read_stack.py --seed-sales 50000 --duration 10
+
+Both stacks are started on local ports with the same number of workers.
+Every endpoint is hit at 1, 50 and 500 concurrent clients, and throughput
+plus p50/p99 latency are printed as JSON.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from common import HOST, fetch, gunicorn_server, setup_django, summarize
+
+ENDPOINTS = {
+    'sales-history': ('/api/sales-history/', '/api/async/sales-history/'),
+    'product-list': ('/api/products/', '/api/async/products/'),
+}
+
+STACKS = {
+    'sync': ['product_project.wsgi:application', '-k', 'sync'],
+    'async': ['product_project.asgi:application', '-k', 'uvicorn_worker.UvicornWorker'],
+}
+
+
+def seed(products, sales):
+    """
+    Bulk-insert a catalogue and sales ledger so the reads have something to page through.
+    """
+    setup_django()
+    from product.seeding import seed_dataset
+    seed_dataset(products, sales_per_product=-(-sales // products))
+
+
+async def load(port, path, clients, duration):
+    latencies = []
+    errors = 0
+    started_at = time.perf_counter()
+    deadline = started_at + duration
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                ok = await fetch(HOST, port, path) == 200
+            except OSError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return summarize(latencies, errors, time.perf_counter() - started_at)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 50, 500])
+    parser.add_argument('--duration', type=float, default=10, help="Seconds per measurement.")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed-products', type=int, default=0)
+    parser.add_argument('--seed-sales', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.seed_products or args.seed_sales:
+        seed(max(args.seed_products, 1), args.seed_sales)
+
+    results = []
+    for stack, app_args in STACKS.items():
+        with gunicorn_server(app_args, args.workers, args.port):
+            for endpoint, paths in ENDPOINTS.items():
+                path = paths[0] if stack == 'sync' else paths[1]
+                for clients in args.concurrency:
+                    result = asyncio.run(load(args.port, path, clients, args.duration))
+                    results.append({"stack": stack, "endpoint": endpoint, "clients": clients, **result})
+
+    json.dump({"workers": args.workers, "duration_s": args.duration, "results": results}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == '__main__':
+    main()
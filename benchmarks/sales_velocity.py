@@ -0,0 +1,129 @@
+"""
+Products per second for the sales-velocity computation: the vectorized
+NumPy pass against the per-product Python loop it replaces.
+
+    python benchmarks/sales_velocity.py --products 50000 --days 365
+
+Synthetic sales are generated in memory as one `(product, day, units)` row
+per product-day with sales, the shape the grouped rollup query returns, and
+both implementations compute the same velocities and days of cover from
+them; the results are compared before any numbers are reported. With
+--database, the report is also timed end to end through `sales_velocity`
+against the configured database; --seed bulk-inserts the catalogue and
+sales there first (and rebuilds the rollup), so point the project at a
+scratch database.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from common import git_commit, setup_django
+
+WINDOWS = (7, 28, 90)
+COVER_WINDOW = 28
+
+
+def synthetic_sales(products, days, density, seed):
+    rng = np.random.default_rng(seed)
+    cells = rng.random((products, days)) < density
+    product_index, day_index = np.nonzero(cells)
+    units = rng.integers(1, 20, size=len(product_index))
+    stock = rng.integers(0, 2000, size=products)
+    return product_index, day_index, units, stock
+
+
+def numpy_velocity(product_index, day_index, units, stock, products, days):
+    from product.analytics import compute_velocity
+
+    matrix = np.zeros((products, days), dtype=np.int64)
+    matrix[product_index, day_index] = units
+    return compute_velocity(matrix, stock, WINDOWS, COVER_WINDOW)
+
+
+def python_velocity(product_index, day_index, units, stock, products, days):
+    sales = {}
+    for product, day, sold in zip(product_index.tolist(), day_index.tolist(), units.tolist()):
+        sales.setdefault(product, []).append((day, sold))
+
+    velocities = {window: [] for window in WINDOWS}
+    cover = []
+    for product in range(products):
+        history = sales.get(product, ())
+        for window in WINDOWS:
+            span = min(window, days)
+            velocities[window].append(sum(sold for day, sold in history if day >= days - span) / span)
+        velocity = velocities[COVER_WINDOW][-1]
+        cover.append(stock[product] / velocity if velocity > 0 else float('inf'))
+    return velocities, cover
+
+
+def best_of(repeat, func):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=50_000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--density', type=float, default=0.2, help="Share of product-days with sales.")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement; the best is kept.")
+    parser.add_argument('--random-seed', type=int, default=0, dest='random_seed')
+    parser.add_argument('--database', action='store_true', help="Also time the report against the database.")
+    parser.add_argument('--seed', action='store_true', help="Seed the database before measuring.")
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args()
+
+    setup_django()
+    product_index, day_index, units, stock = synthetic_sales(args.products, args.days, args.density, args.random_seed)
+    arrays = (product_index, day_index, units, stock, args.products, args.days)
+
+    numpy_seconds, vectorized = best_of(args.repeat, lambda: numpy_velocity(*arrays))
+    python_seconds, (velocities, cover) = best_of(1, lambda: python_velocity(*arrays))
+    for window in WINDOWS:
+        if not np.allclose(vectorized[f'velocity_{window}d'], velocities[window]):
+            sys.exit(f"The {window}-day velocities differ between the two implementations")
+    if not np.allclose(vectorized['days_of_cover'], cover):
+        sys.exit("Days of cover differ between the two implementations")
+
+    report = {
+        "commit": git_commit(),
+        "products": args.products,
+        "days": args.days,
+        "sales_rows": len(units),
+        "numpy_seconds": round(numpy_seconds, 3),
+        "python_seconds": round(python_seconds, 3),
+        "numpy_products_per_s": round(args.products / numpy_seconds),
+        "python_products_per_s": round(args.products / python_seconds),
+    }
+
+    if args.database:
+        from product.analytics import sales_velocity
+
+        if args.seed:
+            from product.reporting import rebuild_sales_rollup
+            from product.seeding import seed_dataset
+            seed_dataset(products=args.products, batches_per_product=1,
+                         sales_per_product=max(1, round(args.days * args.density)), days=args.days)
+            rebuild_sales_rollup()
+        params = {'days': args.days, 'limit': 100}
+        database_seconds, _ = best_of(args.repeat, lambda: sales_velocity(params))
+        report["database_seconds"] = round(database_seconds, 3)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Rows per second for the list serializers: the DRF model serializers against
+the `.values()`-based read serializers the list endpoints use.
+
+    python benchmarks/serializers.py --seed --rows 10000
+
+Each listing is fetched, serialized and rendered to JSON with both
+implementations, reporting the time spent serializing and the whole
+fetch-serialize-render path separately. The two renderings are compared
+byte for byte before any numbers are reported. The product list's unit
+measurements are fetched while serializing on the read-serializer side,
+so compare end-to-end numbers for it. --seed bulk-inserts a dataset into
+the configured database first, so point the project at a scratch database.
+"""
+import argparse
+import json
+import sys
+import time
+
+from common import git_commit, setup_django
+
+
+def listings(rows):
+    from django.db.models import Count
+    from product.models import ProductBatch
+    from product.read_serializers import (ProductBatchListSerializer, ProductListSerializer,
+                                          SalesRecordListSerializer)
+    from product.serializers import (ProductSerializer, RetrieveProductBatchesSerializer,
+                                     SalesRecordSerializer)
+    from product.views import product_batches_queryset, product_list_queryset, sales_history_queryset
+
+    # The product with the most batches, so the batch listing is as long as the data allows
+    busiest = (ProductBatch.objects.values('product_id').annotate(count=Count('id'))
+               .order_by('-count').values_list('product_id', flat=True).first())
+    return {
+        'product-list': (product_list_queryset({}).order_by('-timestamp', '-id')[:rows],
+                         ProductSerializer, ProductListSerializer),
+        'sales-history': (sales_history_queryset({})[:rows], SalesRecordSerializer, SalesRecordListSerializer),
+        'batch-listing': (product_batches_queryset(busiest)[:rows],
+                          RetrieveProductBatchesSerializer, ProductBatchListSerializer),
+    }
+
+
+def measure(fetch, serialize, repeat):
+    from rest_framework.renderers import JSONRenderer
+
+    renderer = JSONRenderer()
+    best_serialize = best_total = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = fetch()
+        fetched = time.perf_counter()
+        data = serialize(rows)
+        serialized = time.perf_counter()
+        content = renderer.render(data)
+        finished = time.perf_counter()
+        best_serialize = min(best_serialize, serialized - fetched)
+        best_total = min(best_total, finished - started)
+    return len(rows), best_serialize, best_total, content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000, help="Rows per listing.")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per measurement; the best is kept.")
+    parser.add_argument('--seed', action='store_true', help="Seed the dataset before measuring.")
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args()
+
+    setup_django()
+    if args.seed:
+        from product.seeding import seed_dataset
+        seed_dataset(products=args.rows, batches_per_product=2, sales_per_product=2)
+        # One long-lived product whose batch listing is `--rows` long
+        seed_dataset(products=1, batches_per_product=args.rows)
+
+    report = {"commit": git_commit(), "rows": args.rows, "listings": {}}
+    for name, (queryset, model_serializer, list_serializer) in listings(args.rows).items():
+        rows, model_serialize, model_total, expected = measure(
+            lambda: list(queryset.all()), lambda page: model_serializer(page, many=True).data, args.repeat)
+        _, fast_serialize, fast_total, content = measure(
+            lambda: list(list_serializer.values(queryset.all())), lambda page: list_serializer(page).data, args.repeat)
+        if content != expected:
+            sys.exit(f"{name}: the read serializer's JSON differs from {model_serializer.__name__}'s")
+
+        report["listings"][name] = {
+            "rows": rows,
+            "model_serializer_rows_per_s": round(rows / model_serialize) if model_serialize else None,
+            "read_serializer_rows_per_s": round(rows / fast_serialize) if fast_serialize else None,
+            "model_end_to_end_rows_per_s": round(rows / model_total) if model_total else None,
+            "read_end_to_end_rows_per_s": round(rows / fast_total) if fast_total else None,
+        }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
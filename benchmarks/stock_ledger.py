@@ -0,0 +1,108 @@
+"""
+Time point-in-time stock replays from the stock ledger, starting from the
+opening balances against starting from a recent snapshot.
+
+    python benchmarks/stock_ledger.py --seed --products 10000 --movements 2000000
+
+--seed appends a synthetic ledger to the configured database: receipts for
+every batch at the start of `--days` days, then sale movements spread over
+them. Point the project at a scratch database. The replay at the end of the
+period is timed once from the opening balances and once after snapshotting
+`--snapshot-age` hours earlier; both must agree batch for batch before any
+numbers are reported.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from common import git_commit, setup_django
+
+
+def seed_ledger(products, batches_per_product, movements, days, seed):
+    from django.db import transaction
+    from django.utils import timezone
+    from product.models import StockMovement
+
+    rng = random.Random(seed)
+    start = timezone.now() - timedelta(days=days)
+    batch_count = products * batches_per_product
+    costs = [Decimal(rng.randint(100, 10000)) / 100 for _ in range(batch_count)]
+    # Batch ids far above any real batch, so the synthetic history stands apart
+    first_batch = 10 ** 12
+
+    with transaction.atomic():
+        StockMovement.objects.bulk_create(
+            (StockMovement(product_id=index // batches_per_product + 1, batch_id=first_batch + index,
+                           kind='receipt', quantity=movements, cost_price=costs[index], created_at=start)
+             for index in range(batch_count)),
+            batch_size=5000,
+        )
+        StockMovement.objects.bulk_create(
+            (StockMovement(product_id=index // batches_per_product + 1, batch_id=first_batch + index,
+                           kind='sale', quantity=-1, cost_price=costs[index],
+                           created_at=start + timedelta(seconds=rng.uniform(1, days * 86400)))
+             for index in (rng.randrange(batch_count) for _ in range(movements))),
+            batch_size=5000,
+        )
+
+
+def timed_replay(at, from_snapshot):
+    from product.ledger import replay_stock
+
+    started = time.perf_counter()
+    replay = replay_stock(at, from_snapshot=from_snapshot)
+    return time.perf_counter() - started, replay
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=10_000)
+    parser.add_argument('--batches-per-product', type=int, default=5, dest='batches_per_product')
+    parser.add_argument('--movements', type=int, default=2_000_000, help="Sale movements to seed.")
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--snapshot-age', type=float, default=24, dest='snapshot_age',
+                        help="Hours before the replay moment to snapshot at.")
+    parser.add_argument('--seed', action='store_true', help="Seed a synthetic ledger before measuring.")
+    parser.add_argument('--random-seed', type=int, default=0, dest='random_seed')
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.utils import timezone
+    from product.ledger import take_stock_snapshot
+
+    if args.seed:
+        seed_ledger(args.products, args.batches_per_product, args.movements, args.days, args.random_seed)
+
+    at = timezone.now()
+    full_seconds, full = timed_replay(at, from_snapshot=False)
+
+    snapshot_started = time.perf_counter()
+    take_stock_snapshot(at - timedelta(hours=args.snapshot_age))
+    snapshot_seconds = time.perf_counter() - snapshot_started
+    snapshot_replay_seconds, recent = timed_replay(at, from_snapshot=True)
+    if recent.batches != full.batches:
+        sys.exit("The snapshot replay differs from the replay from the opening balances")
+
+    report = {
+        "commit": git_commit(),
+        "batches": len(full.batches),
+        "full_replay": {"movements": full.movements, "seconds": round(full_seconds, 3)},
+        "snapshot": {"age_hours": args.snapshot_age, "seconds_to_take": round(snapshot_seconds, 3)},
+        "snapshot_replay": {"movements": recent.movements, "seconds": round(snapshot_replay_seconds, 3)},
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+"""
+Gunicorn config for serving the project over ASGI with uvicorn workers:
+
+    gunicorn -c gunicorn_asgi.conf.py
+
+Async workers do not block on I/O, so they need far fewer processes than
+sync workers to hold the same number of connections open.
+"""
+import multiprocessing
+import os
+
+wsgi_app = "product_project.asgi:application"
+worker_class = "uvicorn_worker.UvicornWorker"
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+keepalive = 5
@@ -0,0 +1,172 @@
+from datetime import date, timedelta
+import numpy as np
+from django.db import connections
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .models import DailySalesRollup, Product
+
+# Trailing windows, in days, reported as moving-average velocities
+VELOCITY_WINDOWS = (7, 28, 90)
+# The window whose velocity drives days of cover and the stock-out projection
+DEFAULT_COVER_WINDOW = 28
+MAX_HISTORY_DAYS = 730
+SALES_FETCH_SIZE = 50000
+
+
+def load_sales_matrix(product_ids, start, end, products=None):
+    """
+    Units sold per product per day from `start` to `end` inclusive, as a
+    `(len(product_ids), days)` array. `product_ids` must be sorted. Sales are
+    grouped by product and day in SQL from the daily rollup, so the database
+    returns at most one row per product-day, and each fetched block of rows
+    becomes three NumPy columns. Pass the filtered Product queryset the ids
+    were read from as `products` to group only those products' sales.
+    """
+    days = (end - start).days + 1
+    matrix = np.zeros((len(product_ids), days), dtype=np.int64)
+    if not len(product_ids):
+        return matrix
+
+    rollup = DailySalesRollup.objects.filter(day__gte=start, day__lte=end)
+    if products is not None:
+        rollup = rollup.filter(product__in=products.values('pk'))
+    rows = (rollup.values('product_id', 'day')
+            .annotate(units=Sum('quantity'))
+            .order_by()
+            .values_list('product_id', 'day', 'units'))
+    # Read through a plain cursor, skipping Django's per-row converters, and
+    # work out each distinct day's column once rather than once per row
+    sql, sql_params = rows.query.sql_with_params()
+    columns_by_day = {}
+    chunks = []
+    with connections[rows.db].cursor() as cursor:
+        cursor.execute(sql, sql_params)
+        while batch := cursor.fetchmany(SALES_FETCH_SIZE):
+            batch_products, sale_days, units = zip(*batch)
+            for day in set(sale_days).difference(columns_by_day):
+                columns_by_day[day] = (day - start).days
+            columns = [columns_by_day[day] for day in sale_days]
+            chunks.append((np.array(batch_products, dtype=np.int64), np.array(columns, dtype=np.int64),
+                           np.array(units, dtype=np.int64)))
+    if not chunks:
+        return matrix
+    sales_products, columns, units = (np.concatenate(parts) for parts in zip(*chunks))
+
+    # Drop sales of products created since the ids were read, then scatter the rest
+    positions = np.minimum(np.searchsorted(product_ids, sales_products), len(product_ids) - 1)
+    known = product_ids[positions] == sales_products
+    matrix[positions[known], columns[known]] = units[known]
+    return matrix
+
+
+def compute_velocity(matrix, stock, windows=VELOCITY_WINDOWS, cover_window=DEFAULT_COVER_WINDOW):
+    """
+    Sales velocity for every product in one vectorized pass over a units-sold
+    matrix (products x days, oldest day first) and the matching stock array.
+
+    Returns a dict of arrays: `units_sold` and `avg_daily_units` over the
+    whole history, `velocity_<n>d` (the n-day moving average ending today)
+    for each window, and `days_of_cover` (stock divided by the cover window's
+    velocity; infinite for products that did not sell).
+    """
+    days = matrix.shape[1]
+    # Running totals with a leading zero column, so any trailing window is one subtraction
+    cumulative = np.zeros((matrix.shape[0], days + 1), dtype=np.int64)
+    np.cumsum(matrix, axis=1, out=cumulative[:, 1:])
+    total = cumulative[:, -1]
+
+    results = {
+        'units_sold': total,
+        'avg_daily_units': total / days if days else np.zeros(len(total)),
+    }
+    for window in sorted(set(windows) | {cover_window}):
+        span = min(window, days)
+        results[f'velocity_{window}d'] = (total - cumulative[:, days - span]) / span if span else np.zeros(len(total))
+
+    velocity = results[f'velocity_{cover_window}d']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cover = np.where(velocity > 0, np.asarray(stock, dtype=np.float64) / velocity, np.inf)
+    results['days_of_cover'] = np.maximum(cover, 0)
+    return results
+
+
+def parse_positive_int(params, param, default, maximum=None):
+    value = params.get(param)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({param: ["A valid integer is required."]})
+    if value < 1 or (maximum is not None and value > maximum):
+        bound = f" and {maximum}" if maximum is not None else ""
+        raise ValidationError({param: [f"Must be between 1{bound}."]})
+    return value
+
+
+def sales_velocity(params):
+    """
+    Average daily units sold, moving-average velocities and projected days of
+    cover per product, most urgent first, read from the daily rollup. Query
+    parameters: `days` of history up to today (default 90), cover `window`
+    (default 28), `category`, `product`, `max_cover` to keep only products
+    running out within that many days, and `limit` (default 100).
+    """
+    days = parse_positive_int(params, 'days', 90, MAX_HISTORY_DAYS)
+    window = parse_positive_int(params, 'window', DEFAULT_COVER_WINDOW, MAX_HISTORY_DAYS)
+    limit = parse_positive_int(params, 'limit', 100)
+    max_cover = parse_positive_int(params, 'max_cover', None)
+
+    products = Product.objects.all()
+    filtered = False
+    if params.get('category'):
+        products = products.filter(category=params['category'])
+        filtered = True
+    if params.get('product'):
+        products = products.filter(pk=parse_positive_int(params, 'product', None))
+        filtered = True
+    catalogue = np.fromiter(
+        products.order_by('pk').values_list('id', 'total_quantity').iterator(chunk_size=20000),
+        dtype=[('id', np.int64), ('stock', np.int64)])
+
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    # The whole catalogue needs no filter; a filtered report only groups its own products' sales
+    matrix = load_sales_matrix(catalogue['id'], start, today, products if filtered else None)
+    windows = tuple(w for w in VELOCITY_WINDOWS if w <= days)
+    metrics = compute_velocity(matrix, catalogue['stock'], windows, window)
+
+    cover = metrics['days_of_cover']
+    order = np.argsort(cover, kind='stable')
+    if max_cover is not None:
+        order = order[cover[order] <= max_cover]
+    order = order[:limit]
+
+    names = dict(Product.objects.filter(pk__in=catalogue['id'][order].tolist()).values_list('id', 'product_name'))
+    # Slow movers can have more cover than there are days left in the calendar
+    last_projectable = (date.max - today).days
+    velocity_fields = [f'velocity_{w}d' for w in sorted(set(windows) | {window})]
+    results = []
+    for index in order.tolist():
+        days_of_cover = float(cover[index])
+        covered = np.isfinite(days_of_cover)
+        product_id = int(catalogue['id'][index])
+        results.append({
+            'product_id': product_id,
+            'product_name': names.get(product_id),
+            'total_quantity': int(catalogue['stock'][index]),
+            'units_sold': int(metrics['units_sold'][index]),
+            'avg_daily_units': round(float(metrics['avg_daily_units'][index]), 2),
+            **{field: round(float(metrics[field][index]), 2) for field in velocity_fields},
+            'days_of_cover': round(days_of_cover, 1) if covered else None,
+            'stockout_date': (today + timedelta(days=int(days_of_cover))
+                              if covered and days_of_cover <= last_projectable else None),
+        })
+
+    return {
+        'as_of': today,
+        'days': days,
+        'window': window,
+        'results': results,
+    }
@@ -6,4 +6,5 @@ class ProductConfig(AppConfig):
     name = 'product'
 
     def ready(self):
-        import product.signals
\ No newline at end of file
+        import product.signals
+        import product.instrumentation
\ No newline at end of file
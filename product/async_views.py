@@ -0,0 +1,87 @@
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from .models import Product
+from .pagination import ProductPagination, SalesHistoryPagination
+from .read_serializers import (ProductBatchListSerializer, ProductListSerializer,
+                               SalesRecordListSerializer)
+from .serializers import ProductSerializer
+from .views import (product_batches_queryset, product_catalogue_queryset,
+                    product_list_queryset, sales_history_queryset)
+
+
+class AsyncReadView(View):
+    """
+    Base for the async-native read endpoints. Rows are fetched with the async
+    ORM, so a slow query parks a coroutine instead of pinning a worker, and
+    responses are rendered exactly like the DRF views they mirror.
+    """
+    renderer = JSONRenderer()
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            data = await self.get_data(Request(request), *args, **kwargs)
+        except Http404:
+            return self.render({"detail": "Not found."}, status.HTTP_404_NOT_FOUND)
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+            return self.render(detail, exc.status_code)
+        return self.render(data)
+
+    async def get_data(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(self.renderer.render(data), status=status_code,
+                            content_type=self.renderer.media_type)
+
+
+class AsyncPaginatedListView(AsyncReadView):
+    serializer_class = None  # a ValuesSerializer
+    pagination_class = None
+
+    def get_queryset(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    async def get_data(self, request, *args, **kwargs):
+        paginator = self.pagination_class()
+        queryset = self.serializer_class.values(self.get_queryset(request, *args, **kwargs))
+        page = paginator.page_queryset(queryset, request)
+        rows = paginator.finish_page([row async for row in page])
+        return paginator.get_paginated_response(await self.serializer_class(rows).adata()).data
+
+
+class AsyncProductListView(AsyncPaginatedListView):
+    serializer_class = ProductListSerializer
+    pagination_class = ProductPagination
+
+    def get_queryset(self, request):
+        return product_list_queryset(request.query_params)
+
+
+class AsyncProductRetrieveView(AsyncReadView):
+
+    async def get_data(self, request, pk):
+        try:
+            product = await product_catalogue_queryset().aget(pk=pk)
+        except Product.DoesNotExist:
+            raise Http404
+        return ProductSerializer(product).data
+
+
+class AsyncProductBatchesView(AsyncReadView):
+
+    async def get_data(self, request, pk):
+        queryset = ProductBatchListSerializer.values(product_batches_queryset(pk))
+        return await ProductBatchListSerializer([batch async for batch in queryset]).adata()
+
+
+class AsyncSalesHistoryView(AsyncPaginatedListView):
+    serializer_class = SalesRecordListSerializer
+    pagination_class = SalesHistoryPagination
+
+    def get_queryset(self, request):
+        return sales_history_queryset(request.query_params)
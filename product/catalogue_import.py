@@ -0,0 +1,245 @@
+import codecs
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+from django.db import DatabaseError, transaction
+from rest_framework.exceptions import ValidationError
+from .models import UNIT_CHOICES, Product, UnitMeasurement
+from .serializers import ProductSerializer
+from .unit_prices import invalidate_unit_prices
+from .utils import bump_catalogue_version, bump_product_versions, sync_low_stock
+from .valuation import invalidate_inventory_valuation
+
+IMPORT_CHUNK_SIZE = 1000
+
+# CSV imports carry one row per product, with a `<unit>_price` column per unit
+# type; an empty price means the product is not sold in that unit
+CSV_REQUIRED_COLUMNS = ('product_name', 'cost_price', 'category')
+CSV_OPTIONAL_COLUMNS = ('reorder_level',)
+CSV_UNIT_PRICE_COLUMNS = {f'{unit_type}_price': unit_type for unit_type, _ in UNIT_CHOICES}
+
+IMPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class ImportFormatError(ValueError):
+    """
+    The import as a whole cannot be read, as opposed to a single bad row.
+    """
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    updated: int = 0
+    errors: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+    @property
+    def rows_per_second(self):
+        rows = self.created + self.updated + self.failed
+        return round(rows / self.elapsed, 1) if self.elapsed else None
+
+    def add_error(self, line, errors):
+        self.errors.append({"line": line, "status": "error", "errors": errors})
+
+
+def ndjson_rows(lines, encoding='utf-8'):
+    """
+    Yield `(line number, row, parse error)` for each non-blank line of an NDJSON stream.
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode(encoding)
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_number, None, {"non_field_errors": [f"NDJSON parse error - {exc}"]}
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, {"non_field_errors": ["Expected a JSON object."]}
+            continue
+        yield line_number, row, None
+
+
+def csv_rows(lines, encoding='utf-8'):
+    """
+    Yield `(line number, row, parse error)` for each record of a CSV stream,
+    folding the `<unit>_price` columns into a `unit_measurements` list.
+    """
+    reader = csv.DictReader(codecs.iterdecode(lines, encoding) if encoding else lines)
+    missing = [column for column in CSV_REQUIRED_COLUMNS if column not in (reader.fieldnames or ())]
+    if missing:
+        raise ImportFormatError(f"CSV header is missing column(s): {', '.join(missing)}.")
+
+    for record in reader:
+        row = {column: record[column] for column in CSV_REQUIRED_COLUMNS}
+        row.update({column: record[column] for column in CSV_OPTIONAL_COLUMNS if (record.get(column) or '').strip()})
+        row['unit_measurements'] = [
+            {'unit_type': unit_type, 'selling_price': record[column]}
+            for column, unit_type in CSV_UNIT_PRICE_COLUMNS.items()
+            if (record.get(column) or '').strip()
+        ]
+        yield reader.line_num, row, None
+
+
+IMPORT_READERS = {
+    'csv': csv_rows,
+    'ndjson': ndjson_rows,
+}
+
+
+def import_products(rows, upsert=False, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Import `(line number, row, parse error)` rows as products with their unit
+    measurements. Rows are validated as they stream in and written a chunk
+    at a time with bulk inserts, each chunk in its own transaction, so memory
+    stays bounded. A database error rolls back only the chunk it happened
+    in: every line of that chunk is reported as failed and the import goes
+    on with the next chunk.
+
+    Product names must be unique within an import. With `upsert`, a row whose
+    name already exists updates that product's cost price and category and
+    sets the prices of the units it lists; without it, the row is rejected.
+    """
+    report = ImportReport()
+    # One serializer validates every row, the way a ListSerializer reuses its
+    # child, so DRF builds the product and unit fields once rather than per row
+    validator = ProductSerializer()
+    seen_names = {}
+    chunk = []
+    started = time.perf_counter()
+
+    for line, row, error in rows:
+        if error is not None:
+            report.add_error(line, error)
+            continue
+
+        try:
+            entry = validator.run_validation(row)
+        except ValidationError as exc:
+            report.add_error(line, exc.detail)
+            continue
+
+        name = entry['product_name']
+        if name in seen_names:
+            report.add_error(line, {"product_name": [f"'{name}' was already imported on line {seen_names[name]}."]})
+            continue
+        seen_names[name] = line
+
+        chunk.append((line, entry))
+        if len(chunk) >= chunk_size:
+            _write_chunk(chunk, upsert, report)
+            chunk = []
+
+    if chunk:
+        _write_chunk(chunk, upsert, report)
+
+    report.errors.sort(key=lambda error: error['line'])
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def _write_chunk(chunk, upsert, report):
+    # Counts and errors only reach the report once the chunk has committed
+    written = ImportReport()
+    try:
+        with transaction.atomic():
+            _import_chunk(chunk, upsert, written)
+    except DatabaseError as exc:
+        for line, _ in chunk:
+            report.add_error(line, {"non_field_errors": [
+                f"Not imported: the database rejected lines {chunk[0][0]}-{chunk[-1][0]} ({exc})."]})
+        return
+    report.created += written.created
+    report.updated += written.updated
+    report.errors += written.errors
+
+
+def _import_chunk(chunk, upsert, report):
+    existing = {}
+    for product_id, name, reorder_level in (
+            Product.objects.filter(product_name__in=[entry['product_name'] for _, entry in chunk])
+            .values_list('id', 'product_name', 'reorder_level')):
+        existing.setdefault(name, []).append((product_id, reorder_level))
+
+    new_entries = []
+    updates = {}
+    for line, entry in chunk:
+        matches = existing.get(entry['product_name'])
+        if not matches:
+            new_entries.append(entry)
+        elif not upsert:
+            report.add_error(line, {"product_name": [f"A product named '{entry['product_name']}' already exists."]})
+        elif len(matches) > 1:
+            report.add_error(line, {"product_name": [
+                f"{len(matches)} products are named '{entry['product_name']}', so it cannot be updated by name."]})
+        else:
+            product_id, reorder_level = matches[0]
+            # A row without a reorder level keeps the current one
+            entry.setdefault('reorder_level', reorder_level)
+            updates[product_id] = entry
+
+    imported_ids = list(updates)
+    if new_entries:
+        imported_ids += _create_products(new_entries)
+    if updates:
+        _update_products(updates)
+        invalidate_inventory_valuation()
+    sync_low_stock(imported_ids)
+
+    report.created += len(new_entries)
+    report.updated += len(updates)
+
+
+def _create_products(entries):
+    products = Product.objects.bulk_create([
+        Product(product_name=entry['product_name'], cost_price=entry['cost_price'], category=entry['category'],
+                reorder_level=entry.get('reorder_level', 0))
+        for entry in entries
+    ])
+    UnitMeasurement.objects.bulk_create([
+        UnitMeasurement(product=product, **unit)
+        for product, entry in zip(products, entries)
+        for unit in entry['unit_measurements']
+    ])
+    bump_catalogue_version()
+    return [product.pk for product in products]
+
+
+def _update_products(updates):
+    Product.objects.bulk_update([
+        Product(pk=product_id, cost_price=entry['cost_price'], category=entry['category'],
+                reorder_level=entry['reorder_level'])
+        for product_id, entry in updates.items()
+    ], ['cost_price', 'category', 'reorder_level'])
+
+    units = {(unit.product_id, unit.unit_type): unit
+             for unit in UnitMeasurement.objects.filter(product_id__in=updates).only(
+                 'id', 'product_id', 'unit_type', 'selling_price')}
+    changed_units = []
+    new_units = []
+    for product_id, entry in updates.items():
+        for unit in entry['unit_measurements']:
+            current = units.get((product_id, unit['unit_type']))
+            if current is None:
+                new_units.append(UnitMeasurement(product_id=product_id, **unit))
+            elif current.selling_price != unit['selling_price']:
+                current.selling_price = unit['selling_price']
+                changed_units.append(current)
+
+    UnitMeasurement.objects.bulk_update(changed_units, ['selling_price'])
+    UnitMeasurement.objects.bulk_create(new_units)
+    # Bulk writes skip the signals that normally do this
+    invalidate_unit_prices(updates)
+    bump_product_versions(updates)
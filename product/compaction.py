@@ -0,0 +1,98 @@
+from itertools import groupby
+from operator import attrgetter
+from django.db.models import Count, Q, Sum
+from .models import ProductBatch, StockMovement
+from .utils import (archive_batches, bump_product_versions, lock_products_for_sale,
+                    run_sale_transaction, total_quantity_sync_suspended)
+
+COMPACTION_CHUNK_SIZE = 500
+
+
+def compactable_product_ids(product_ids=None):
+    """
+    Products with more than one live batch or with sold-out batches left behind.
+    """
+    batches = ProductBatch.objects.all()
+    if product_ids:
+        batches = batches.filter(product_id__in=product_ids)
+    return list(batches.values('product_id')
+                .annotate(batch_count=Count('id'), empty=Count('id', filter=Q(quantity=0)))
+                .filter(Q(batch_count__gt=1) | Q(empty__gt=0))
+                .order_by('product_id')
+                .values_list('product_id', flat=True))
+
+
+def compact_product_batches(product_ids=None, chunk_size=COMPACTION_CHUNK_SIZE):
+    """
+    Merge runs of adjacent batches with the same cost price into the oldest
+    batch of the run and archive the absorbed and sold-out batches, so FIFO
+    has fewer rows to lock and walk. Sale costs are unchanged because units
+    are consumed in the same order at the same price.
+
+    Each chunk of products is locked the way a sale locks them and runs in
+    its own transaction. Merges are written to the stock ledger as a pair of
+    movements out of the absorbed batch and into the survivor. Returns
+    `(merged, depleted)` batch counts.
+    """
+    ids = compactable_product_ids(product_ids)
+    merged = depleted = 0
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        chunk_merged, chunk_depleted = run_sale_transaction(lambda: _compact_chunk(chunk))
+        merged += chunk_merged
+        depleted += chunk_depleted
+    return merged, depleted
+
+
+def _compact_chunk(product_ids):
+    lock_products_for_sale(product_ids)
+    batches = (ProductBatch.objects.select_for_update()
+               .filter(product_id__in=product_ids)
+               .order_by('product_id', 'added_on', 'id'))
+
+    survivors = {}
+    absorbed = {}
+    empty = []
+    for _, product_batches in groupby(batches, key=attrgetter('product_id')):
+        survivor = None
+        for batch in product_batches:
+            if batch.quantity == 0:
+                empty.append(batch)
+            elif survivor is not None and batch.cost_price == survivor.cost_price:
+                absorbed[batch] = survivor.pk
+                survivor.quantity += batch.quantity
+                survivors[survivor.pk] = survivor
+            else:
+                survivor = batch
+
+    if not absorbed and not empty:
+        return 0, 0
+
+    # Units only move between batches of the same product, so totals stand
+    with total_quantity_sync_suspended():
+        archive_batches(absorbed, 'merged', {batch.pk: target for batch, target in absorbed.items()})
+        archive_batches(empty, 'depleted')
+        StockMovement.objects.bulk_create([
+            movement
+            for batch, target in absorbed.items()
+            for movement in (StockMovement.for_batch(batch, 'merge', -batch.quantity),
+                             StockMovement.for_batch(batch, 'merge', batch.quantity, batch_id=target))
+        ])
+        ProductBatch.objects.filter(pk__in=[batch.pk for batch in [*absorbed, *empty]]).delete()
+        ProductBatch.objects.bulk_update(survivors.values(), ['quantity'])
+
+    bump_product_versions({batch.product_id for batch in [*absorbed, *empty]})
+    return len(absorbed), len(empty)
+
+
+def batch_fanout(top=20, min_batches=1):
+    """
+    Live batch counts per product, largest first, with totals across the table.
+    """
+    per_product = (ProductBatch.objects.values('product_id', 'product__product_name')
+                   .annotate(batch_count=Count('id'), empty=Count('id', filter=Q(quantity=0)),
+                             units=Sum('quantity'))
+                   .filter(batch_count__gte=min_batches)
+                   .order_by('-batch_count', 'product_id'))
+    summary = ProductBatch.objects.aggregate(batches=Count('id'), products=Count('product_id', distinct=True))
+    return summary, list(per_product[:top])
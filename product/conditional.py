@@ -0,0 +1,90 @@
+import hashlib
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from .models import CatalogueVersion, Product
+
+# Rendered JSON bodies are cached under their ETag. The ETag changes with the
+# data, so an entry can never be served stale; the timeout only bounds memory.
+# Set to None to turn the server-side cache off.
+RESPONSE_CACHE_TIMEOUT = 300
+RESPONSE_CACHE_KEY = 'rendered-response:{}'
+
+
+def product_version(product_id):
+    """
+    `(version key, last modified)` for one product, or None if it does not exist.
+    """
+    row = Product.objects.filter(pk=product_id).values_list('version', 'updated_at').first()
+    if row is None:
+        return None
+    version, updated_at = row
+    return f"product:{product_id}:{version}", updated_at
+
+
+def catalogue_version():
+    """
+    `(version key, last modified)` for the whole catalogue, read from the
+    CatalogueVersion row that every product write moves. None without the
+    row, which a test flush can remove, until the next write recreates it.
+    """
+    row = CatalogueVersion.objects.filter(pk=1).values_list('version', 'updated_at').first()
+    if row is None:
+        return None
+    version, updated_at = row
+    # The timestamp keeps keys apart when the counter restarts after a flush or restore
+    return f"catalogue:{version}:{updated_at.isoformat()}", updated_at
+
+
+class ConditionalGetMixin:
+    """
+    Conditional GET for DRF views. Subclasses return a version from
+    get_version(); requests whose If-None-Match or If-Modified-Since still
+    match get a 304 without the view running, and unchanged JSON bodies are
+    served from the cache instead of being serialized and rendered again.
+    """
+    _response_cache_key = None
+
+    def get_version(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        version = self.get_version()
+        if version is None:
+            return super().get(request, *args, **kwargs)
+
+        version_key, last_modified = version
+        # The same data renders differently per page, filter and media type
+        fingerprint = f"{version_key}|{request.get_full_path()}|{request.accepted_media_type}"
+        etag = quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            cache_key = RESPONSE_CACHE_KEY.format(etag)
+            cached = cache.get(cache_key) if self.response_is_cacheable(request) else None
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                response = super().get(request, *args, **kwargs)
+                if self.response_is_cacheable(request):
+                    self._response_cache_key = cache_key
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def response_is_cacheable(self, request):
+        # Only JSON: the browsable API embeds per-request forms and tokens
+        return RESPONSE_CACHE_TIMEOUT is not None and request.accepted_renderer.format == 'json'
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self._response_cache_key and response.status_code == 200:
+            response.render()
+            cache.set(self._response_cache_key, (response.content, response['Content-Type']), RESPONSE_CACHE_TIMEOUT)
+        return response
@@ -0,0 +1,61 @@
+import csv
+import json
+from .models import SalesRecord
+
+SALES_EXPORT_COLUMNS = ['id', 'product_id', 'product_name', 'unit_type', 'quantity',
+                        'revenue', 'cost', 'profit', 'sale_date']
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Echo:
+    """
+    A file-like object that hands back whatever is written to it, so csv.writer
+    can format one row at a time for a streaming response.
+    """
+    def write(self, value):
+        return value
+
+
+def sales_export_rows(queryset=None):
+    """
+    Yield sales as plain tuples in SALES_EXPORT_COLUMNS order, oldest first,
+    reading through a server-side cursor without building model instances.
+    """
+    if queryset is None:
+        queryset = SalesRecord.objects.all()
+    rows = (queryset.order_by('sale_date', 'id')
+            .values_list('id', 'product_id', 'product__product_name', 'unit_type', 'quantity',
+                         'revenue', 'cost', 'profit', 'sale_date'))
+    return rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _formatted(row):
+    *values, sale_date = row
+    return [*values, sale_date.isoformat()]
+
+
+def iter_sales_csv(queryset=None):
+    writer = csv.writer(Echo())
+    yield writer.writerow(SALES_EXPORT_COLUMNS)
+    for row in sales_export_rows(queryset):
+        yield writer.writerow(_formatted(row))
+
+
+def iter_sales_ndjson(queryset=None):
+    for row in sales_export_rows(queryset):
+        record = dict(zip(SALES_EXPORT_COLUMNS, _formatted(row)))
+        for column in ('revenue', 'cost', 'profit'):
+            record[column] = str(record[column])
+        yield json.dumps(record) + '\n'
+
+
+EXPORTERS = {
+    'csv': iter_sales_csv,
+    'ndjson': iter_sales_ndjson,
+}
@@ -0,0 +1,97 @@
+import hashlib
+import json
+from datetime import timedelta
+from django.db import IntegrityError
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.status import is_success
+from rest_framework.utils.encoders import JSONEncoder
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+# Stored responses are replayed for this long, then purged by
+# `manage.py purge_idempotency_keys`.
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+
+def request_fingerprint(request):
+    """
+    Hash of the method, path and parsed payload, so a retry with the same
+    body matches however its JSON keys were ordered.
+    """
+    payload = json.dumps(request.data, cls=JSONEncoder, sort_keys=True)
+    return hashlib.sha256(f"{request.method} {request.path}\n{payload}".encode()).hexdigest()
+
+
+def purge_idempotency_keys(ttl=IDEMPOTENCY_KEY_TTL):
+    """
+    Delete stored responses older than `ttl`. Returns how many were removed.
+    """
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=timezone.now() - ttl).delete()
+    return deleted
+
+
+class IdempotentPostMixin:
+    """
+    `Idempotency-Key` support for write views. The view runs its work through
+    run_idempotent() and passes its response through remember_response()
+    inside the transaction that made the writes, so the stored response
+    commits or rolls back with them.
+
+    A retry with the same key and payload gets the stored response back
+    without the view running; the same key with a different payload is
+    rejected. Only successful responses are stored, since failed ones wrote
+    nothing and are safe to run again.
+    """
+    _idempotency = None
+
+    def run_idempotent(self, request, process):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return process()
+        if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return Response({"error": f"{IDEMPOTENCY_HEADER} must be 1 to {IDEMPOTENCY_KEY_MAX_LENGTH} characters."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_fingerprint(request)
+        replay = self.replay_response(key, fingerprint)
+        if replay is not None:
+            return replay
+
+        self._idempotency = (key, fingerprint)
+        try:
+            return process()
+        except IntegrityError:
+            # A concurrent request with the same key committed first
+            replay = self.replay_response(key, fingerprint)
+            if replay is None:
+                raise
+            return replay
+
+    def replay_response(self, key, fingerprint):
+        stored = IdempotencyKey.objects.filter(key=key).first()
+        if stored is None:
+            return None
+        if stored.created_at < timezone.now() - IDEMPOTENCY_KEY_TTL:
+            stored.delete()
+            return None
+        if stored.request_hash != fingerprint:
+            return Response({"error": f"{IDEMPOTENCY_HEADER} '{key}' was already used for a different request."},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        response = Response(json.loads(stored.response_body), status=stored.status_code)
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+    def remember_response(self, response):
+        if self._idempotency is not None and is_success(response.status_code):
+            key, fingerprint = self._idempotency
+            IdempotencyKey.objects.create(
+                key=key,
+                request_hash=fingerprint,
+                status_code=response.status_code,
+                response_body=json.dumps(response.data, cls=JSONEncoder),
+            )
+        return response
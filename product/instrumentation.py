@@ -0,0 +1,246 @@
+import hmac
+import json
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger('product.requests')
+
+# A statement shape seen more often than this in one request is reported as a likely N+1
+N_PLUS_ONE_THRESHOLD = 10
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+_current = ContextVar('request_metrics', default=None)
+
+_IN_LIST = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def sql_shape(sql):
+    """
+    Collapse a statement to its shape, so the same query with different
+    parameters or IN-list lengths counts as a repeat.
+    """
+    return _LITERAL.sub('?', _IN_LIST.sub('(...)', sql))
+
+
+@dataclass
+class RequestMetrics:
+    started: float = field(default_factory=time.perf_counter)
+    view_started: float = None
+    queries: int = 0
+    sql_time: float = 0.0
+    serializer_time: float = 0.0
+    serializer_depth: int = 0
+    shapes: Counter = field(default_factory=Counter)
+
+    def repeated_shapes(self):
+        return {shape: count for shape, count in self.shapes.items() if count > N_PLUS_ONE_THRESHOLD}
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.sql_time += time.perf_counter() - started
+        metrics.queries += 1
+        metrics.shapes[sql_shape(sql)] += 1
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # Installed on every connection, whichever thread opens it, so queries run
+    # by the async ORM's worker threads are attributed to the request as well
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class InstrumentedSerializerMixin:
+    """
+    Adds the time spent turning objects into primitives to the current request's metrics.
+    Nested serializers only count once, through their outermost parent.
+    """
+
+    def to_representation(self, instance):
+        metrics = _current.get()
+        if metrics is None:
+            return super().to_representation(instance)
+        metrics.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializer_depth -= 1
+            if metrics.serializer_depth == 0:
+                metrics.serializer_time += time.perf_counter() - started
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Per-process request counters and histograms, rendered in the Prometheus
+    text format. Each worker process reports its own numbers.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.n_plus_one = Counter()
+        self.durations = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.sql_durations = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.query_counts = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))
+
+    def observe(self, method, route, status_code, metrics, duration):
+        with self.lock:
+            self.requests[(method, route, str(status_code))] += 1
+            self.durations[(method, route)].observe(duration)
+            self.sql_durations[(method, route)].observe(metrics.sql_time)
+            self.query_counts[(method, route)].observe(metrics.queries)
+            if metrics.repeated_shapes():
+                self.n_plus_one[(method, route)] += 1
+
+    def render(self):
+        lines = []
+        with self.lock:
+            lines += ["# HELP http_requests_total Requests handled, by route and status.",
+                      "# TYPE http_requests_total counter"]
+            for (method, route, status_code), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status_code}"}} {count}')
+
+            lines += ["# HELP http_n_plus_one_requests_total Requests that repeated one SQL shape "
+                      f"more than {N_PLUS_ONE_THRESHOLD} times.",
+                      "# TYPE http_n_plus_one_requests_total counter"]
+            for (method, route), count in sorted(self.n_plus_one.items()):
+                lines.append(f'http_n_plus_one_requests_total{{method="{method}",route="{route}"}} {count}')
+
+            for name, help_text, histograms in (
+                ("http_request_duration_seconds", "Time spent handling the request.", self.durations),
+                ("http_request_sql_duration_seconds", "Time spent in SQL per request.", self.sql_durations),
+                ("http_request_sql_queries", "SQL queries per request.", self.query_counts),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (method, route), histogram in sorted(histograms.items()):
+                    labels = f'method="{method}",route="{route}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def metrics_view(request):
+    # Without the token, or with none configured, this is the same 404 as any unknown path
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    if not settings.METRICS_TOKEN or not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+        raise Http404
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4')
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Records per-request query count, SQL time, serializer time and view time.
+    They are exposed as a Server-Timing header and a structured DEBUG log
+    line, and fed to the /metrics counters. Repeated SQL shapes are logged as
+    likely N+1s at WARNING.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view_started = time.perf_counter()
+
+    def finish(self, request, response, metrics):
+        finished = time.perf_counter()
+        total = finished - metrics.started
+        view = finished - metrics.view_started if metrics.view_started else 0.0
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match else 'unmatched'
+
+        response['Server-Timing'] = ", ".join([
+            f'db;dur={metrics.sql_time * 1000:.2f};desc="{metrics.queries} queries"',
+            f'serialize;dur={metrics.serializer_time * 1000:.2f}',
+            f'view;dur={view * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+        registry.observe(request.method, route, response.status_code, metrics, total)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            record = {
+                "method": request.method,
+                "path": request.path,
+                "route": route,
+                "status": response.status_code,
+                "queries": metrics.queries,
+                "sql_ms": round(metrics.sql_time * 1000, 2),
+                "serializer_ms": round(metrics.serializer_time * 1000, 2),
+                "view_ms": round(view * 1000, 2),
+                "total_ms": round(total * 1000, 2),
+            }
+            logger.debug(json.dumps(record), extra={"request_metrics": record})
+        repeated = metrics.repeated_shapes()
+        for shape, count in repeated.items():
+            logger.warning(json.dumps({"event": "n_plus_one", "route": route, "count": count, "sql": shape}))
+        return response
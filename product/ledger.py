@@ -0,0 +1,170 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .models import Product, StockMovement, StockSnapshot, StockSnapshotLine
+from .utils import parse_date_bound
+
+# Snapshots stop this far in the past, so a write still in flight when the
+# snapshot is taken cannot commit a movement inside the span it covers
+SNAPSHOT_SETTLE_TIME = timedelta(minutes=5)
+SNAPSHOT_CHUNK_SIZE = 5000
+
+CENT = Decimal('0.01')
+
+
+@dataclass
+class StockReplay:
+    """
+    Every batch's quantity and unit cost just before `at`, keyed by
+    `(product_id, batch_id)`, and what the replay started from.
+    """
+    at: datetime
+    snapshot: StockSnapshot
+    movements: int
+    batches: dict
+
+
+def replay_stock(at, product_ids=None, from_snapshot=True):
+    """
+    Rebuild the batches on hand just before `at` from the latest snapshot
+    taken before it plus the movements since, so the cost grows with the
+    movements after the snapshot rather than with the whole ledger. Without
+    an earlier snapshot, or with `from_snapshot=False` to audit the
+    snapshots, the replay starts at the opening balances.
+    """
+    snapshot = None
+    if from_snapshot:
+        snapshot = StockSnapshot.objects.filter(as_of__lt=at).order_by('-as_of').first()
+    movements = StockMovement.objects.filter(created_at__lt=at)
+    batches = {}
+    if snapshot is not None:
+        lines = snapshot.lines.all()
+        if product_ids is not None:
+            lines = lines.filter(product_id__in=product_ids)
+        for product_id, batch_id, quantity, cost_price in lines.values_list(
+                'product_id', 'batch_id', 'quantity', 'cost_price').iterator(chunk_size=SNAPSHOT_CHUNK_SIZE):
+            batches[product_id, batch_id] = [quantity, cost_price]
+        movements = movements.filter(created_at__gt=snapshot.as_of)
+    if product_ids is not None:
+        movements = movements.filter(product_id__in=product_ids)
+
+    replayed = 0
+    for product_id, batch_id, quantity, cost_price in (
+            movements.order_by('created_at', 'id')
+            .values_list('product_id', 'batch_id', 'quantity', 'cost_price')
+            .iterator(chunk_size=SNAPSHOT_CHUNK_SIZE)):
+        replayed += 1
+        batch = batches.get((product_id, batch_id))
+        if batch is None:
+            batches[product_id, batch_id] = [quantity, cost_price]
+        else:
+            batch[0] += quantity
+            batch[1] = cost_price
+
+    return StockReplay(at=at, snapshot=snapshot, movements=replayed,
+                       batches={key: batch for key, batch in batches.items() if batch[0]})
+
+
+def batch_ledger_quantity(product_id, batch_id):
+    """
+    A batch's quantity according to the ledger, for writes that did not load the quantity they replaced.
+    """
+    return (StockMovement.objects.filter(product_id=product_id, batch_id=batch_id)
+            .aggregate(total=Sum('quantity'))['total'] or 0)
+
+
+def take_stock_snapshot(as_of=None):
+    """
+    Store every batch's quantity and cost as of `as_of` (default: now less
+    SNAPSHOT_SETTLE_TIME), itself replayed from the previous snapshot.
+    Returns `(snapshot, line count)`; a snapshot that already exists for
+    `as_of` is returned as it is.
+    """
+    as_of = as_of or timezone.now() - SNAPSHOT_SETTLE_TIME
+    existing = StockSnapshot.objects.filter(as_of=as_of).first()
+    if existing is not None:
+        return existing, existing.lines.count()
+
+    # Replays read movements before their moment, and the snapshot covers `as_of` itself
+    replay = replay_stock(as_of + timedelta(microseconds=1))
+    with transaction.atomic():
+        snapshot = StockSnapshot.objects.create(as_of=as_of)
+        StockSnapshotLine.objects.bulk_create(
+            (StockSnapshotLine(snapshot=snapshot, product_id=product_id, batch_id=batch_id,
+                               quantity=quantity, cost_price=cost_price)
+             for (product_id, batch_id), (quantity, cost_price) in replay.batches.items()),
+            batch_size=SNAPSHOT_CHUNK_SIZE,
+        )
+    return snapshot, len(replay.batches)
+
+
+def cost_of_goods_sold(start, end, product_ids=None):
+    """
+    `{product_id: cost}` of the units sales drew from batches in `[start, end)`.
+    """
+    movements = StockMovement.objects.filter(kind='sale', created_at__gte=start, created_at__lt=end)
+    if product_ids is not None:
+        movements = movements.filter(product_id__in=product_ids)
+    return dict(movements.values('product_id')
+                .annotate(cost=Sum(-F('quantity') * F('cost_price'),
+                                   output_field=DecimalField(max_digits=20, decimal_places=2)))
+                .order_by()
+                .values_list('product_id', 'cost'))
+
+
+def stock_history(params):
+    """
+    Quantity on hand and its value at cost per product at the moment `at`
+    (a date means the end of that day; default now), replayed from the
+    ledger, with the cost of goods sold from `date_from` (default: the start
+    of that day) up to it. An optional `product` narrows it to one product.
+    """
+    at = parse_date_bound(params['at'], 'at', end=True) if params.get('at') else timezone.now()
+    if params.get('date_from'):
+        start = parse_date_bound(params['date_from'], 'date_from')
+    else:
+        start = timezone.localtime(at - timedelta(microseconds=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    if start > at:
+        raise ValidationError({'date_from': ["Must not be after `at`."]})
+
+    product_ids = None
+    if params.get('product'):
+        try:
+            product_ids = [int(params['product'])]
+        except ValueError:
+            raise ValidationError({'product': ["A valid integer is required."]})
+
+    replay = replay_stock(at, product_ids)
+    cogs = cost_of_goods_sold(start, at, product_ids)
+
+    products = {}
+    for (product_id, _), (quantity, cost_price) in replay.batches.items():
+        product = products.setdefault(product_id, {"quantity": 0, "value": Decimal(0)})
+        product["quantity"] += quantity
+        product["value"] += quantity * cost_price
+    for product_id in cogs:
+        products.setdefault(product_id, {"quantity": 0, "value": Decimal(0)})
+
+    names = dict(Product.objects.filter(pk__in=products).values_list('id', 'product_name'))
+    rows = [{
+        "product_id": product_id,
+        "product_name": names.get(product_id),
+        "quantity": totals["quantity"],
+        "value": totals["value"].quantize(CENT),
+        "cost_of_goods_sold": cogs.get(product_id, Decimal(0)).quantize(CENT),
+    } for product_id, totals in sorted(products.items())]
+
+    return {
+        "at": at,
+        "date_from": start,
+        "snapshot": replay.snapshot.as_of if replay.snapshot else None,
+        "movements_replayed": replay.movements,
+        "total_quantity": sum(row["quantity"] for row in rows),
+        "total_value": sum((row["value"] for row in rows), Decimal(0)),
+        "cost_of_goods_sold": sum((row["cost_of_goods_sold"] for row in rows), Decimal(0)),
+        "products": rows,
+    }
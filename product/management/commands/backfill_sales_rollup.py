@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from product.reporting import rebuild_sales_rollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily sales rollup from the sales ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', dest='date_from', help="First day to rebuild (YYYY-MM-DD).")
+        parser.add_argument('--date-to', dest='date_to', help="Last day to rebuild (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        bounds = {}
+        for key in ('date_from', 'date_to'):
+            if options[key]:
+                try:
+                    bounds[key] = parse_date(options[key])
+                except ValueError:
+                    bounds[key] = None
+                if bounds[key] is None:
+                    raise CommandError(f"'{options[key]}' is not a valid date (YYYY-MM-DD).")
+
+        written = rebuild_sales_rollup(**bounds)
+        self.stdout.write(self.style.SUCCESS(f"{written} daily rollup row(s) written."))
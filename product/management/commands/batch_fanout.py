@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from product.compaction import batch_fanout
+
+
+class Command(BaseCommand):
+    help = "Report how many live FIFO batches each product has."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help="How many products to list.")
+        parser.add_argument('--min-batches', type=int, default=1,
+                            help="Only list products with at least this many batches.")
+
+    def handle(self, *args, **options):
+        summary, rows = batch_fanout(options['top'], options['min_batches'])
+
+        for row in rows:
+            self.stdout.write(f"{row['product__product_name']} (id {row['product_id']}): "
+                              f"{row['batch_count']} batch(es), {row['empty']} sold out, {row['units']} unit(s)")
+
+        average = summary['batches'] / summary['products'] if summary['products'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['batches']} live batch(es) across {summary['products']} product(s), "
+            f"{average:.1f} per product on average."))
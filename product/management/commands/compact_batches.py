@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from product.compaction import COMPACTION_CHUNK_SIZE, compact_product_batches
+
+
+class Command(BaseCommand):
+    help = "Merge adjacent same-cost batches and archive sold-out ones to keep FIFO scans short."
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_ids', nargs='*', type=int,
+                            help="Only compact these products (default: all).")
+        parser.add_argument('--chunk-size', type=int, default=COMPACTION_CHUNK_SIZE,
+                            help="Products locked and compacted per transaction.")
+
+    def handle(self, *args, **options):
+        merged, depleted = compact_product_batches(options['product_ids'] or None, options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{merged} batch(es) merged and {depleted} sold-out batch(es) archived."))
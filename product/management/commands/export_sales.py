@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+from product.exports import EXPORTERS
+from product.models import SalesRecord
+from product.utils import filter_sales
+
+
+class Command(BaseCommand):
+    help = "Stream the sales ledger as CSV or NDJSON with constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORTERS), default='csv', dest='output_format')
+        parser.add_argument('--output', help="File to write to (default: stdout).")
+        parser.add_argument('--product', help="Only export sales of this product id.")
+        parser.add_argument('--unit-type', dest='unit_type')
+        parser.add_argument('--date-from', dest='date_from', help="YYYY-MM-DD or ISO datetime, inclusive.")
+        parser.add_argument('--date-to', dest='date_to', help="YYYY-MM-DD or ISO datetime, inclusive.")
+
+    def handle(self, *args, **options):
+        params = {key: options[key] for key in ('product', 'unit_type', 'date_from', 'date_to') if options[key]}
+        try:
+            queryset = filter_sales(SalesRecord.objects.all(), params)
+        except ValidationError as exc:
+            raise CommandError(exc.detail)
+
+        chunks = EXPORTERS[options['output_format']](queryset)
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,42 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from product.catalogue_import import (IMPORT_CHUNK_SIZE, IMPORT_READERS, ImportFormatError,
+                                      import_products)
+
+
+class Command(BaseCommand):
+    help = "Import a product catalogue with unit measurements from CSV or NDJSON, streaming it in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or - for stdin.")
+        parser.add_argument('--format', choices=sorted(IMPORT_READERS), dest='input_format',
+                            help="Input format (default: from the file extension).")
+        parser.add_argument('--upsert', action='store_true',
+                            help="Update products that already exist by name instead of rejecting them.")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+                            help="Rows written per transaction.")
+
+    def handle(self, *args, **options):
+        input_format = options['input_format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if input_format not in IMPORT_READERS:
+            raise CommandError("Cannot tell the format from the file name; pass --format.")
+
+        try:
+            if options['path'] == '-':
+                report = self.run_import(sys.stdin.buffer, input_format, options)
+            else:
+                with open(options['path'], 'rb') as source:
+                    report = self.run_import(source, input_format, options)
+        except (OSError, ImportFormatError) as exc:
+            raise CommandError(exc)
+
+        for error in report.errors:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.created} product(s) created, {report.updated} updated, {report.failed} failed "
+            f"in {report.elapsed:.2f}s ({report.rows_per_second} rows/s)."))
+
+    def run_import(self, source, input_format, options):
+        return import_products(IMPORT_READERS[input_format](source), upsert=options['upsert'],
+                               chunk_size=options['chunk_size'])
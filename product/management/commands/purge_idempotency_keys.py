@@ -0,0 +1,18 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from product.idempotency import IDEMPOTENCY_KEY_TTL, purge_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses that are past their TTL."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=IDEMPOTENCY_KEY_TTL.total_seconds() / 3600,
+                            help="Delete responses older than this many hours (default: the replay TTL).")
+
+    def handle(self, *args, **options):
+        if options['hours'] < 0:
+            raise CommandError("--hours cannot be negative.")
+
+        deleted = purge_idempotency_keys(timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(f"{deleted} stored response(s) purged."))
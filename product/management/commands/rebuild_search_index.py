@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from product.search import drop_search_index, install_search_index, sqlite_search_available
+
+
+class Command(BaseCommand):
+    help = "Drop and recreate the product search index, reindexing every product."
+
+    def handle(self, *args, **options):
+        with connection.schema_editor() as schema_editor:
+            drop_search_index(schema_editor)
+            install_search_index(schema_editor)
+
+        if connection.vendor == 'sqlite' and not sqlite_search_available(connection.alias):
+            self.stderr.write("This SQLite build has no FTS5, so searches scan the product table.")
+        else:
+            self.stdout.write(self.style.SUCCESS("Product search index rebuilt."))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from product.utils import find_total_quantity_drift, repair_total_quantities
+
+
+class Command(BaseCommand):
+    help = "Recompute Product.total_quantity from its batches and repair any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_ids', nargs='*', type=int,
+                            help="Only check these products (default: all).")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report drift without writing anything.")
+
+    def handle(self, *args, **options):
+        product_ids = options['product_ids'] or None
+
+        if options['dry_run']:
+            drift = find_total_quantity_drift(product_ids)
+        else:
+            drift = repair_total_quantities(product_ids)
+
+        for product_id, product_name, stored, actual in drift:
+            self.stdout.write(f"{product_name} (id {product_id}): stored {stored}, batches hold {actual}")
+
+        verb = "would be repaired" if options['dry_run'] else "repaired"
+        self.stdout.write(self.style.SUCCESS(f"{len(drift)} product(s) {verb}."))
@@ -0,0 +1,42 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.exceptions import ValidationError
+from product.analytics import DEFAULT_COVER_WINDOW, sales_velocity
+
+
+class Command(BaseCommand):
+    help = "List products by projected days of cover at their recent sales velocity."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help="Days of sales history to read.")
+        parser.add_argument('--window', type=int, default=DEFAULT_COVER_WINDOW,
+                            help="Days of sales the cover projection averages over.")
+        parser.add_argument('--category', help="Only this category.")
+        parser.add_argument('--product', help="Only this product id.")
+        parser.add_argument('--max-cover', type=int, dest='max_cover',
+                            help="Only products with at most this many days of cover.")
+        parser.add_argument('--limit', type=int, default=100, help="How many products to list.")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        params = {key: options[key] for key in ('days', 'window', 'category', 'product', 'max_cover', 'limit')
+                  if options[key] is not None}
+        try:
+            report = sales_velocity(params)
+        except ValidationError as exc:
+            raise CommandError(exc.detail)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, cls=DjangoJSONEncoder, indent=2))
+            return
+
+        velocity = f"velocity_{report['window']}d"
+        for row in report['results']:
+            cover = (f"{row['days_of_cover']} day(s) of cover, out around {row['stockout_date']}"
+                     if row['days_of_cover'] is not None else "no recent sales")
+            self.stdout.write(f"{row['product_name']} (id {row['product_id']}): {row['total_quantity']} in stock, "
+                              f"{row[velocity]}/day over {report['window']} day(s), {cover}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(report['results'])} product(s) from {report['days']} day(s) of sales up to {report['as_of']}."))
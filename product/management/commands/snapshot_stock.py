@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+from product.ledger import SNAPSHOT_SETTLE_TIME, take_stock_snapshot
+from product.utils import parse_date_bound
+
+
+class Command(BaseCommand):
+    help = "Snapshot every batch's quantity and cost so stock history replays start from it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', dest='as_of',
+                            help=f"ISO datetime to snapshot (default: {int(SNAPSHOT_SETTLE_TIME.total_seconds() // 60)} "
+                                 "minutes ago, so in-flight writes have settled).")
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['as_of']:
+            try:
+                as_of = parse_date_bound(options['as_of'], 'as_of')
+            except ValidationError as exc:
+                raise CommandError(exc.detail)
+
+        snapshot, lines = take_stock_snapshot(as_of)
+        self.stdout.write(self.style.SUCCESS(f"Stock snapshot as of {snapshot.as_of} holds {lines} batch(es)."))
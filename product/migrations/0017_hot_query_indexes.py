@@ -0,0 +1,57 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:46
+
+import logging
+from django.db import migrations, models
+from django.db.models import Count
+
+logger = logging.getLogger('product.migrations')
+
+
+def remove_duplicate_unit_types(apps, schema_editor):
+    # The unique constraint needs one row per (product, unit_type). Duplicates
+    # that agree on the price are collapsed onto the most recently added row,
+    # and each removed row is logged. Duplicates with different prices stop
+    # the migration, since only an operator can say which price is right.
+    UnitMeasurement = apps.get_model('product', 'UnitMeasurement')
+    duplicated = (UnitMeasurement.objects.values('product_id', 'unit_type')
+                  .annotate(rows=Count('id')).filter(rows__gt=1)
+                  .values_list('product_id', 'unit_type'))
+    removed = []
+    conflicts = []
+    for product_id, unit_type in duplicated:
+        rows = list(UnitMeasurement.objects.filter(product_id=product_id, unit_type=unit_type)
+                    .order_by('-id').values_list('id', 'selling_price'))
+        if len({price for _, price in rows}) > 1:
+            conflicts.append(f"  product {product_id}, {unit_type}: "
+                             + ", ".join(f"id {row_id} at {price}" for row_id, price in rows))
+        else:
+            removed += [(row_id, product_id, unit_type, price) for row_id, price in rows[1:]]
+
+    if conflicts:
+        raise RuntimeError(
+            "Some products have the same unit type more than once, at different selling prices. "
+            "Delete the rows with the wrong price, then run migrate again:\n" + "\n".join(conflicts))
+
+    for row_id, product_id, unit_type, price in removed:
+        logger.warning("Removing duplicate unit measurement %s: product %s, %s at %s",
+                       row_id, product_id, unit_type, price)
+    UnitMeasurement.objects.filter(id__in=[row[0] for row in removed]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0016_product_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productbatch',
+            index=models.Index(fields=['product', 'added_on', 'id'], name='batch_product_fifo_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_unit_types, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='unitmeasurement',
+            constraint=models.UniqueConstraint(fields=('product', 'unit_type'), name='unique_product_unit_type'),
+        ),
+    ]
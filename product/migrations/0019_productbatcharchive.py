@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0018_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductBatchArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_id', models.BigIntegerField()),
+                ('quantity', models.IntegerField()),
+                ('cost_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('added_on', models.DateTimeField()),
+                ('archived_on', models.DateTimeField(auto_now_add=True)),
+                ('reason', models.CharField(choices=[('depleted', 'Depleted'), ('merged', 'Merged')], max_length=10)),
+                ('merged_into', models.BigIntegerField(blank=True, null=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_batches', to='product.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'archived_on'], name='batch_archive_product_idx')],
+            },
+        ),
+    ]
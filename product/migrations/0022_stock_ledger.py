@@ -0,0 +1,68 @@
+# Generated by Django 5.1.1 on 2026-10-18 21:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def record_opening_balances(apps, schema_editor):
+    # The ledger starts now: every live batch opens with what it holds today
+    ProductBatch = apps.get_model('product', 'ProductBatch')
+    StockMovement = apps.get_model('product', 'StockMovement')
+    opened_at = django.utils.timezone.now()
+    batches = (ProductBatch.objects.filter(quantity__gt=0).order_by('id')
+               .values_list('id', 'product_id', 'quantity', 'cost_price'))
+    StockMovement.objects.bulk_create(
+        (StockMovement(product_id=product_id, batch_id=batch_id, kind='opening', quantity=quantity,
+                       cost_price=cost_price, created_at=opened_at)
+         for batch_id, product_id, quantity, cost_price in batches.iterator(chunk_size=5000)),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0021_low_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateTimeField(unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockSnapshotLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_id', models.BigIntegerField()),
+                ('quantity', models.IntegerField()),
+                ('cost_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='product.product')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='product.stocksnapshot')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['snapshot', 'product'], name='stock_snapshot_line_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_id', models.BigIntegerField()),
+                ('kind', models.CharField(choices=[('opening', 'Opening balance'), ('receipt', 'Receipt'), ('sale', 'Sale'), ('merge', 'Merge'), ('adjustment', 'Adjustment')], max_length=10)),
+                ('quantity', models.IntegerField()),
+                ('cost_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='stock_movements', to='product.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at', 'id'], name='stock_movement_time_idx'), models.Index(fields=['product', 'created_at'], name='stock_movement_product_idx')],
+            },
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.1.1 on 2026-10-18 21:40
+
+from django.db import OperationalError, migrations, transaction
+
+# The DDL is spelled out here rather than imported from product.search, so
+# later changes to the live index cannot change what this migration did
+SQLITE_SETUP = [
+    """CREATE VIRTUAL TABLE product_search USING fts5(
+        product_name, category, content='product_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')""",
+    "INSERT INTO product_search(product_search) VALUES ('rebuild')",
+    """CREATE TRIGGER product_search_insert AFTER INSERT ON product_product BEGIN
+        INSERT INTO product_search(rowid, product_name, category) VALUES (new.id, new.product_name, new.category);
+    END""",
+    """CREATE TRIGGER product_search_delete AFTER DELETE ON product_product BEGIN
+        INSERT INTO product_search(product_search, rowid, product_name, category)
+        VALUES ('delete', old.id, old.product_name, old.category);
+    END""",
+    """CREATE TRIGGER product_search_update AFTER UPDATE OF product_name, category ON product_product
+    WHEN old.product_name IS NOT new.product_name OR old.category IS NOT new.category BEGIN
+        INSERT INTO product_search(product_search, rowid, product_name, category)
+        VALUES ('delete', old.id, old.product_name, old.category);
+        INSERT INTO product_search(rowid, product_name, category) VALUES (new.id, new.product_name, new.category);
+    END""",
+]
+SQLITE_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS product_search_insert",
+    "DROP TRIGGER IF EXISTS product_search_delete",
+    "DROP TRIGGER IF EXISTS product_search_update",
+    "DROP TABLE IF EXISTS product_search",
+]
+
+POSTGRES_DOCUMENT = "to_tsvector('simple', product_name || ' ' || category)"
+POSTGRES_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS product_search_fts_idx ON product_product USING gin (({POSTGRES_DOCUMENT}))",
+    "CREATE INDEX IF NOT EXISTS product_name_trgm_idx ON product_product USING gin (product_name gin_trgm_ops)",
+]
+POSTGRES_TEARDOWN = [
+    "DROP INDEX IF EXISTS product_search_fts_idx",
+    "DROP INDEX IF EXISTS product_name_trgm_idx",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for statement in POSTGRES_SETUP:
+            schema_editor.execute(statement)
+    elif vendor == 'sqlite':
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                for statement in SQLITE_SETUP:
+                    schema_editor.execute(statement)
+        except OperationalError:
+            # SQLite built without FTS5: search falls back to scanning
+            pass
+
+
+def remove_search_index(apps, schema_editor):
+    teardown = {'postgresql': POSTGRES_TEARDOWN, 'sqlite': SQLITE_TEARDOWN}
+    for statement in teardown.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0022_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, remove_search_index),
+    ]
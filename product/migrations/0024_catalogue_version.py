@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-18 21:43
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_catalogue_version(apps, schema_editor):
+    # Start from the latest product write, so existing Last-Modified dates stay valid
+    CatalogueVersion = apps.get_model('product', 'CatalogueVersion')
+    Product = apps.get_model('product', 'Product')
+    latest = Product.objects.order_by('-updated_at').values_list('updated_at', flat=True).first()
+    CatalogueVersion.objects.create(pk=1, version=1, updated_at=latest or django.utils.timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0023_product_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogueVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(create_catalogue_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.1 on 2026-10-18 23:05
+
+from django.db import migrations
+
+# PostgreSQL only: replace the expression and trigram indexes with a stored,
+# weighted document column, so ranking does not rebuild the document per row
+POSTGRES_FORWARD = [
+    "DROP INDEX IF EXISTS product_search_fts_idx",
+    "DROP INDEX IF EXISTS product_name_trgm_idx",
+    """ALTER TABLE product_product ADD COLUMN IF NOT EXISTS search_document tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', product_name), 'A') || setweight(to_tsvector('simple', category), 'B')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS product_search_document_idx ON product_product USING gin (search_document)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS product_search_document_idx",
+    "ALTER TABLE product_product DROP COLUMN IF EXISTS search_document",
+    "CREATE INDEX IF NOT EXISTS product_search_fts_idx ON product_product USING gin "
+    "((to_tsvector('simple', product_name || ' ' || category)))",
+    "CREATE INDEX IF NOT EXISTS product_name_trgm_idx ON product_product USING gin (product_name gin_trgm_ops)",
+]
+
+
+def store_search_document(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in POSTGRES_FORWARD:
+            schema_editor.execute(statement)
+
+
+def restore_expression_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in POSTGRES_BACKWARD:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0024_catalogue_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(store_search_document, restore_expression_indexes),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 PRODUCT_CATEGORY = [
     ("drugs", "Drugs"),
@@ -14,6 +15,24 @@ UNIT_CHOICES = [
     ("bag", "Bag")
 ]
 
+LOW_STOCK_EVENTS = [
+    ("low", "Low"),
+    ("restocked", "Restocked")
+]
+
+ARCHIVE_REASONS = [
+    ("depleted", "Depleted"),
+    ("merged", "Merged")
+]
+
+MOVEMENT_KINDS = [
+    ("opening", "Opening balance"),
+    ("receipt", "Receipt"),
+    ("sale", "Sale"),
+    ("merge", "Merge"),
+    ("adjustment", "Adjustment")
+]
+
 # Create your models here.
 class Product(models.Model):
 
@@ -23,19 +42,53 @@ class Product(models.Model):
     cost_price  = models.DecimalField(max_digits=10, decimal_places=2)
     category = models.CharField(max_length=15, choices=PRODUCT_CATEGORY)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Bumped whenever the product, its unit measurements or its batches change;
+    # drives the ETag and Last-Modified of the catalogue and batch endpoints
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Stock at or below this level needs reordering; 0 turns alerting off
+    reorder_level = models.PositiveIntegerField(default=0)
+    # Set while the product is at or below its reorder level, kept in step
+    # with total_quantity by sync_low_stock()
+    low_stock_since = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Backs keyset pagination of the catalogue
+            models.Index(fields=['timestamp', 'id'], name='product_timestamp_id_idx'),
+            # Catalogue imports match existing products by name
+            models.Index(fields=['product_name'], name='product_name_idx'),
+            # Only low-stock products are indexed, so the reorder list stays a small read
+            models.Index(fields=['low_stock_since', 'id'], name='product_low_stock_idx',
+                         condition=models.Q(low_stock_since__isnull=False)),
+        ]
 
     def __str__(self):
         return f"{self.product_name} has been added to the product catalogue"
 
 
+class CatalogueVersion(models.Model):
+    """
+    A single row counting writes to the catalogue, moved with every product
+    version bump, create and delete, so revalidating the catalogue's ETag is
+    one primary-key read however many products there are.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+
 class UnitMeasurement(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="unit_measurements")
     unit_type = models.CharField(max_length=50, choices=UNIT_CHOICES)
     selling_price = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        constraints = [
+            # Also the index behind sale-time unit validation
+            models.UniqueConstraint(fields=['product', 'unit_type'], name='unique_product_unit_type'),
+        ]
+
     def __str__(self):
         return f"{self.unit_type} of {self.product.product_name} at NGN{self.selling_price}"
     
@@ -46,9 +99,124 @@ class ProductBatch(models.Model):
     cost_price = models.DecimalField(max_digits=10, decimal_places=2)
     added_on = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # FIFO reads a product's batches oldest first
+            models.Index(fields=['product', 'added_on', 'id'], name='batch_product_fifo_idx'),
+        ]
+
     def __str__(self):
         return f"Batch of {self.product.product_name}: {self.quantity} units at NGN{self.cost_price}"
-    
+
+
+class LowStockEvent(models.Model):
+    """
+    A product crossing its reorder level, downwards ("low") or back above it
+    ("restocked"). Read in id order as the low-stock event stream.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='low_stock_events')
+    event = models.CharField(max_length=10, choices=LOW_STOCK_EVENTS)
+    total_quantity = models.IntegerField()
+    reorder_level = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.product.product_name} {self.event} at {self.total_quantity} (reorder level {self.reorder_level})"
+
+
+class ProductBatchArchive(models.Model):
+    """
+    Cold copy of a batch that left the live FIFO table, either because it was
+    sold out or because compaction merged it into an older batch at the same
+    cost price. Kept for audit only; nothing on the sale path reads it.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='archived_batches')
+    batch_id = models.BigIntegerField()
+    # Units the batch still held when it was archived: the last units sold
+    # from it, or the units moved into `merged_into`
+    quantity = models.IntegerField()
+    cost_price = models.DecimalField(max_digits=10, decimal_places=2)
+    added_on = models.DateTimeField()
+    archived_on = models.DateTimeField(auto_now_add=True)
+    reason = models.CharField(max_length=10, choices=ARCHIVE_REASONS)
+    merged_into = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'archived_on'], name='batch_archive_product_idx'),
+        ]
+
+    @classmethod
+    def from_batch(cls, batch, reason, merged_into=None):
+        return cls(product_id=batch.product_id, batch_id=batch.pk, quantity=batch.quantity,
+                   cost_price=batch.cost_price, added_on=batch.added_on, reason=reason, merged_into=merged_into)
+
+    def __str__(self):
+        return f"Archived batch {self.batch_id} of product {self.product_id} ({self.reason})"
+
+
+class StockMovement(models.Model):
+    """
+    One change to one batch, appended and never updated: units received,
+    drawn by a sale, moved by compaction or edited by hand. Replaying a
+    batch's movements gives its quantity at any moment; `cost_price` is the
+    batch's unit cost from that movement on.
+    """
+    # Not a real foreign key, so deleting a product or a batch leaves its history behind
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, db_constraint=False,
+                                related_name='stock_movements')
+    batch_id = models.BigIntegerField()
+    kind = models.CharField(max_length=10, choices=MOVEMENT_KINDS)
+    # Signed: positive when units arrive in the batch, negative when they leave
+    quantity = models.IntegerField()
+    cost_price = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Replay reads the movements after a snapshot in order
+            models.Index(fields=['created_at', 'id'], name='stock_movement_time_idx'),
+            models.Index(fields=['product', 'created_at'], name='stock_movement_product_idx'),
+        ]
+
+    @classmethod
+    def for_batch(cls, batch, kind, quantity, batch_id=None):
+        return cls(product_id=batch.product_id, batch_id=batch_id or batch.pk, kind=kind,
+                   quantity=quantity, cost_price=batch.cost_price)
+
+    def __str__(self):
+        return f"{self.kind} of {self.quantity} unit(s) in batch {self.batch_id} of product {self.product_id}"
+
+
+class StockSnapshot(models.Model):
+    """
+    Every live batch's quantity and cost as of `as_of`, so point-in-time
+    replays start here instead of at the first movement.
+    """
+    as_of = models.DateTimeField(unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Stock snapshot as of {self.as_of}"
+
+
+class StockSnapshotLine(models.Model):
+    snapshot = models.ForeignKey(StockSnapshot, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, db_constraint=False,
+                                related_name='+')
+    batch_id = models.BigIntegerField()
+    quantity = models.IntegerField()
+    cost_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        indexes = [
+            # Replays for a few products read only their lines of the snapshot
+            models.Index(fields=['snapshot', 'product'], name='stock_snapshot_line_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} unit(s) of batch {self.batch_id} in {self.snapshot}"
+
 
 class SalesRecord(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='records')
@@ -59,5 +227,58 @@ class SalesRecord(models.Model):
     profit = models.DecimalField(max_digits=10, decimal_places=2)
     sale_date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Back keyset pagination of the sales history, overall and per product
+            models.Index(fields=['sale_date', 'id'], name='sale_date_id_idx'),
+            models.Index(fields=['product', 'sale_date', 'id'], name='sale_product_date_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"Sale of {self.quantity} {self.unit_type} of {self.product.product_name}"
+
+
+class DailySalesRollup(models.Model):
+    """
+    Sales totals per product, unit type and day, kept up to date as sales are
+    recorded so reports read one row per day instead of the whole ledger.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    unit_type = models.CharField(max_length=50)
+    day = models.DateField()
+    sale_count = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    profit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'unit_type', 'day'], name='unique_daily_sales_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='daily_sales_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} {self.unit_type} of {self.product.product_name} sold on {self.day}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    The stored response of a write that was sent with an `Idempotency-Key`
+    header, so a retried request is answered without running again.
+    """
+    key = models.CharField(max_length=255, unique=True)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response_body = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='idempotency_created_idx'),
+        ]
+
     def __str__(self):
-        return f"Sale of {self.quantity} {self.unit_type} of {self.product.product_name}"
\ No newline at end of file
+        return f"{self.key} ({self.status_code})"
@@ -0,0 +1,163 @@
+import base64
+import json
+from datetime import datetime
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on a `(timestamp, id)` pair. Each page filters on
+    the last row of the previous one instead of counting an offset, so any
+    page costs the same as the first when the pair is backed by an index.
+    """
+    ordering = None  # e.g. ('-sale_date', '-id'); both fields in the same direction
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(list(self.page_queryset(queryset, request)))
+
+    def page_queryset(self, queryset, request):
+        """
+        The unevaluated queryset for the requested page, with one extra row
+        to tell whether there is a next page. Async callers iterate it
+        themselves and hand the rows to finish_page().
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+        return queryset[:self.page_size + 1]
+
+    def finish_page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = self.position_of(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def after(self, position):
+        """
+        The rows strictly past `position` in the pagination order.
+        """
+        (time_field, id_field), (time_value, id_value) = self.fields, position
+        lookup = 'lt' if self.ordering[0].startswith('-') else 'gt'
+        return (Q(**{f'{time_field}__{lookup}': time_value})
+                | Q(**{time_field: time_value, f'{id_field}__{lookup}': id_value}))
+
+    @property
+    def fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def position_of(self, row):
+        time_field, id_field = self.fields
+        if isinstance(row, dict):
+            return row[time_field], row[id_field]
+        return getattr(row, time_field), getattr(row, id_field)
+
+    def encode_cursor(self, position):
+        time_value, id_value = position
+        payload = json.dumps([time_value.isoformat(), id_value]).encode()
+        return base64.urlsafe_b64encode(payload).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            time_value, id_value = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            time_value = parse_datetime(time_value)
+            if not isinstance(time_value, datetime):
+                raise ValueError
+            return time_value, int(id_value)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class SalesHistoryPagination(KeysetPagination):
+    ordering = ('-sale_date', '-id')
+
+
+class ProductPagination(KeysetPagination):
+    ordering = ('-timestamp', '-id')
+
+
+class LowStockPagination(KeysetPagination):
+    # Longest-running shortages first
+    ordering = ('low_stock_since', 'id')
+
+
+class SearchPagination(KeysetPagination):
+    """
+    Keyset pagination over ranked search results, keyed on `(rank, id)`
+    rather than a timestamp. Ranks are recomputed for each page, so the
+    cursor compares against the exact float the previous page ended on.
+    """
+    ordering = ('rank', 'id')
+    page_size = 20
+    max_page_size = 100
+
+    def paginate_search(self, search, request):
+        """
+        Call `search(position, limit)` for the requested page and trim it like paginate_queryset().
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        return self.finish_page(search(self.decode_cursor(request), self.page_size + 1))
+
+    def encode_cursor(self, position):
+        return base64.urlsafe_b64encode(json.dumps(list(position)).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            rank, id_value = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return float(rank), int(id_value)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
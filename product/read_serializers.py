@@ -0,0 +1,191 @@
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from .instrumentation import InstrumentedSerializerMixin
+from .models import UnitMeasurement
+
+BATCH_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def as_decimal_string(value):
+    # The columns already hold `decimal_places` digits, which is all DRF's quantize adds
+    return format(value, 'f')
+
+
+def decimal_converter():
+    return as_decimal_string if api_settings.COERCE_DECIMAL_TO_STRING else None
+
+
+def datetime_converter(output_format=None):
+    """
+    Renders datetimes like a DRF DateTimeField with `output_format` (the
+    API's DATETIME_FORMAT by default), with the format and time zone
+    resolved once per response instead of once per row.
+    """
+    output_format = output_format or api_settings.DATETIME_FORMAT
+    if output_format is None:
+        return None
+
+    if settings.USE_TZ:
+        # Datetimes come back from the database aware exactly when USE_TZ is on
+        tz = timezone.get_current_timezone()
+
+        def localize(value):
+            return value.astimezone(tz)
+    else:
+        def localize(value):
+            return value
+
+    if output_format.lower() == ISO_8601:
+        def convert(value):
+            value = localize(value).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    elif output_format == BATCH_TIME_FORMAT:
+        def convert(value):
+            # Same text as the strftime pattern, without parsing it per row
+            return localize(value).isoformat(' ', 'seconds')[:19]
+    else:
+        def convert(value):
+            return localize(value).strftime(output_format)
+    return convert
+
+
+class ValuesSerializer:
+    """
+    Read-only serializer over `.values()` rows for list endpoints. Each field
+    is `(name, lookup, converter factory or None)`. Converters are built once
+    per response (a factory may return None to pass values through) and are
+    applied straight to the row values. This skips DRF's per-field machinery
+    but renders the same JSON as the model serializer it stands in for.
+    """
+    fields = ()
+    # Read for pagination cursors but not rendered
+    extra_lookups = ()
+
+    def __init__(self, rows):
+        self.instance = rows
+        self.related = None
+
+    @classmethod
+    def values(cls, queryset):
+        lookups = [lookup for _, lookup, _ in cls.fields]
+        lookups += [lookup for lookup in cls.extra_lookups if lookup not in lookups]
+        return queryset.prefetch_related(None).values(*lookups)
+
+    def related_queryset(self, rows):
+        """
+        Rows of any nested data, fetched with one query for the whole page.
+        """
+        return None
+
+    @property
+    def data(self):
+        related = self.related_queryset(self.instance)
+        self.related = list(related) if related is not None else None
+        return self.to_representation(self.instance)
+
+    async def adata(self):
+        related = self.related_queryset(self.instance)
+        self.related = [row async for row in related] if related is not None else None
+        return self.to_representation(self.instance)
+
+    def to_representation(self, rows):
+        converters = [(name, lookup, factory() if factory else None) for name, lookup, factory in self.fields]
+        # Null values pass through unconverted, as DRF skips fields whose value is None
+        return [
+            {name: convert(row[lookup]) if convert and row[lookup] is not None else row[lookup]
+             for name, lookup, convert in converters}
+            for row in rows
+        ]
+
+
+class ProductListSerializer(InstrumentedSerializerMixin, ValuesSerializer):
+    fields = (
+        ('id', 'id', None),
+        ('product_name', 'product_name', None),
+        ('total_quantity', 'total_quantity', None),
+        ('reorder_level', 'reorder_level', None),
+        ('cost_price', 'cost_price', decimal_converter),
+        ('category', 'category', None),
+        ('timestamp', 'timestamp', lambda: datetime_converter(BATCH_TIME_FORMAT)),
+    )
+
+    def related_queryset(self, rows):
+        # The same query as the catalogue's unit_measurements prefetch
+        return UnitMeasurement.objects.filter(product_id__in=[row['id'] for row in rows]).values_list(
+            'product_id', 'unit_type', 'selling_price')
+
+    def to_representation(self, rows):
+        convert_price = decimal_converter()
+        units = {}
+        for product_id, unit_type, selling_price in self.related or ():
+            if convert_price:
+                selling_price = convert_price(selling_price)
+            units.setdefault(product_id, []).append({'unit_type': unit_type, 'selling_price': selling_price})
+
+        products = super().to_representation(rows)
+        for product in products:
+            product['unit_measurements'] = units.get(product['id'], [])
+        return products
+
+
+class SalesRecordListSerializer(InstrumentedSerializerMixin, ValuesSerializer):
+    fields = (
+        ('product_name', 'product__product_name', None),
+        ('unit_type', 'unit_type', None),
+        ('quantity', 'quantity', None),
+        ('revenue', 'revenue', decimal_converter),
+        ('cost', 'cost', decimal_converter),
+        ('profit', 'profit', decimal_converter),
+        ('sale_date', 'sale_date', datetime_converter),
+    )
+    extra_lookups = ('id',)
+
+
+class ProductBatchListSerializer(InstrumentedSerializerMixin, ValuesSerializer):
+    fields = (
+        ('product', 'product_id', None),
+        ('quantity', 'quantity', None),
+        ('cost_price', 'cost_price', decimal_converter),
+        ('added_on', 'added_on', lambda: datetime_converter(BATCH_TIME_FORMAT)),
+    )
+
+
+class LowStockListSerializer(ValuesSerializer):
+    fields = (
+        ('id', 'id', None),
+        ('product_name', 'product_name', None),
+        ('total_quantity', 'total_quantity', None),
+        ('reorder_level', 'reorder_level', None),
+        ('low_stock_since', 'low_stock_since', datetime_converter),
+    )
+
+
+class LowStockEventListSerializer(ValuesSerializer):
+    fields = (
+        ('id', 'id', None),
+        ('product', 'product_id', None),
+        ('product_name', 'product__product_name', None),
+        ('event', 'event', None),
+        ('total_quantity', 'total_quantity', None),
+        ('reorder_level', 'reorder_level', None),
+        ('created_at', 'created_at', datetime_converter),
+    )
+
+
+class ValuesListMixin:
+    """
+    Serves a generic view's list GET from `.values()` rows through
+    `list_serializer_class`; serializer_class still handles writes and the
+    API schema.
+    """
+    list_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        rows = self.list_serializer_class.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.list_serializer_class(page).data)
+        return Response(self.list_serializer_class(rows).data)
@@ -0,0 +1,28 @@
+import json
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# How long EventSource clients wait before reconnecting for the next events
+EVENT_STREAM_RETRY_MS = 5000
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Renders a `{"results": [...]}` page of events as Server-Sent Events. The
+    response ends after the page; the browser's EventSource reconnects after
+    the retry delay and sends the last id back as Last-Event-ID, so clients get
+    a live stream without a worker being held open per listener.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        lines = [f"retry: {EVENT_STREAM_RETRY_MS}", ""]
+        if not isinstance(data, dict) or 'results' not in data:
+            lines += ["event: error", f"data: {json.dumps(data, cls=JSONEncoder)}", ""]
+        else:
+            for event in data['results']:
+                lines += [f"id: {event['id']}", f"event: {event['event']}",
+                          f"data: {json.dumps(event, cls=JSONEncoder)}", ""]
+        return ("\n".join(lines) + "\n").encode(self.charset)
@@ -0,0 +1,127 @@
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from .models import DailySalesRollup, SalesRecord
+
+ROLLUP_TOTAL_FIELDS = ['sale_count', 'quantity', 'revenue', 'cost', 'profit']
+
+REPORT_PERIODS = {
+    'day': None,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def add_sales_to_rollup(sales):
+    """
+    Fold a basket's SalesRecords into their days' rollup rows with one read,
+    one bulk update and one bulk insert. Must run in the sales' transaction,
+    with the products locked, so two baskets cannot both insert the same row.
+    """
+    totals = {}
+    for sale in sales:
+        key = (sale.product_id, sale.unit_type, timezone.localdate(sale.sale_date))
+        row = totals.setdefault(key, {"sale_count": 0, "quantity": 0, "revenue": 0, "cost": 0, "profit": 0})
+        row["sale_count"] += 1
+        row["quantity"] += sale.quantity
+        row["revenue"] += sale.revenue
+        row["cost"] += sale.cost
+        row["profit"] += sale.profit
+    if not totals:
+        return
+
+    existing = DailySalesRollup.objects.filter(
+        product_id__in={product_id for product_id, _, _ in totals},
+        unit_type__in={unit_type for _, unit_type, _ in totals},
+        day__in={day for _, _, day in totals},
+    ).only('id', 'product_id', 'unit_type', 'day')
+
+    to_update = []
+    for rollup in existing:
+        row = totals.pop((rollup.product_id, rollup.unit_type, rollup.day), None)
+        if row is None:
+            continue
+        for field, amount in row.items():
+            setattr(rollup, field, F(field) + amount)
+        to_update.append(rollup)
+
+    if to_update:
+        DailySalesRollup.objects.bulk_update(to_update, ROLLUP_TOTAL_FIELDS)
+    DailySalesRollup.objects.bulk_create([
+        DailySalesRollup(product_id=product_id, unit_type=unit_type, day=day, **row)
+        for (product_id, unit_type, day), row in totals.items()
+    ])
+
+
+def rebuild_sales_rollup(date_from=None, date_to=None, batch_size=1000):
+    """
+    Recompute the rollup from the raw ledger with one grouped query, replacing
+    the rows for the days covered. Returns the number of rollup rows written.
+    """
+    sales = SalesRecord.objects.annotate(day=TruncDate('sale_date'))
+    rollups = DailySalesRollup.objects.all()
+    if date_from:
+        sales = sales.filter(day__gte=date_from)
+        rollups = rollups.filter(day__gte=date_from)
+    if date_to:
+        sales = sales.filter(day__lte=date_to)
+        rollups = rollups.filter(day__lte=date_to)
+
+    totals = (sales.values('product_id', 'unit_type', 'day')
+              .annotate(sale_count=Count('id'), quantity=Sum('quantity'), revenue=Sum('revenue'),
+                        cost=Sum('cost'), profit=Sum('profit'))
+              .order_by())
+
+    with transaction.atomic():
+        rollups.delete()
+        created = DailySalesRollup.objects.bulk_create(
+            (DailySalesRollup(**row) for row in totals.iterator()), batch_size=batch_size
+        )
+    return len(created)
+
+
+def parse_report_date(params, param):
+    value = params.get(param)
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValidationError({param: [f"'{value}' is not a valid date (YYYY-MM-DD)."]})
+    return day
+
+
+def sales_report(params):
+    """
+    Revenue, cost and profit per product per `period` (day, week or month),
+    read from the daily rollup rather than the sales ledger.
+    """
+    period = params.get('period', 'day')
+    if period not in REPORT_PERIODS:
+        raise ValidationError({'period': [f"Use one of: {', '.join(REPORT_PERIODS)}."]})
+
+    rollups = DailySalesRollup.objects.all()
+    date_from = parse_report_date(params, 'date_from')
+    date_to = parse_report_date(params, 'date_to')
+    if date_from:
+        rollups = rollups.filter(day__gte=date_from)
+    if date_to:
+        rollups = rollups.filter(day__lte=date_to)
+    if params.get('product'):
+        try:
+            rollups = rollups.filter(product_id=int(params['product']))
+        except ValueError:
+            raise ValidationError({'product': ["A valid integer is required."]})
+
+    trunc = REPORT_PERIODS[period]
+    rollups = rollups.annotate(period_start=trunc('day') if trunc else F('day'))
+    return list(
+        rollups.values('period_start', 'product_id', product_name=F('product__product_name'))
+        .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'), cost=Sum('cost'), profit=Sum('profit'))
+        .order_by('period_start', 'product_id')
+    )
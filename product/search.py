@@ -0,0 +1,204 @@
+import re
+from functools import lru_cache
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Q
+from .models import Product
+
+SEARCH_TABLE = 'product_search'
+SEARCH_MAX_TERMS = 8
+# Shorter first words match too much of the catalogue to rank quickly
+SEARCH_MIN_PREFIX = 3
+
+# Name matches weigh more than category matches when ranking
+SQLITE_RANK = f"bm25({SEARCH_TABLE}, 10.0, 1.0)"
+
+# SQLite: an FTS5 index over the product table's name and category, with
+# prefix indexes so partial words are matched without scanning, kept in
+# step by triggers so bulk writes that skip signals are indexed too
+SQLITE_SEARCH_SETUP = [
+    """CREATE VIRTUAL TABLE product_search USING fts5(
+        product_name, category, content='product_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')""",
+    "INSERT INTO product_search(product_search) VALUES ('rebuild')",
+    """CREATE TRIGGER product_search_insert AFTER INSERT ON product_product BEGIN
+        INSERT INTO product_search(rowid, product_name, category) VALUES (new.id, new.product_name, new.category);
+    END""",
+    """CREATE TRIGGER product_search_delete AFTER DELETE ON product_product BEGIN
+        INSERT INTO product_search(product_search, rowid, product_name, category)
+        VALUES ('delete', old.id, old.product_name, old.category);
+    END""",
+    # Stock and version updates rewrite products constantly; only reindex when the text changes
+    """CREATE TRIGGER product_search_update AFTER UPDATE OF product_name, category ON product_product
+    WHEN old.product_name IS NOT new.product_name OR old.category IS NOT new.category BEGIN
+        INSERT INTO product_search(product_search, rowid, product_name, category)
+        VALUES ('delete', old.id, old.product_name, old.category);
+        INSERT INTO product_search(rowid, product_name, category) VALUES (new.id, new.product_name, new.category);
+    END""",
+]
+SQLITE_SEARCH_TRIGGERS = ('product_search_insert', 'product_search_delete', 'product_search_update')
+SQLITE_SEARCH_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS product_search_insert",
+    "DROP TRIGGER IF EXISTS product_search_delete",
+    "DROP TRIGGER IF EXISTS product_search_update",
+    "DROP TABLE IF EXISTS product_search",
+]
+
+# PostgreSQL: the name and category as a stored tsvector column, weighted so
+# name matches rank first, under a GIN index for whole and prefix words.
+# Storing it spares rebuilding the document for every matched row when ranking.
+# PostgreSQL will not alter the type of a column a generated column reads, so
+# a migration changing product_name or category drops the index first.
+POSTGRES_DOCUMENT = "search_document"
+POSTGRES_RANK = "ts_rank('{0, 0, 0.1, 1.0}', search_document, query)"
+POSTGRES_SEARCH_SETUP = [
+    """ALTER TABLE product_product ADD COLUMN IF NOT EXISTS search_document tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', product_name), 'A') || setweight(to_tsvector('simple', category), 'B')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS product_search_document_idx ON product_product USING gin (search_document)",
+]
+POSTGRES_SEARCH_TEARDOWN = [
+    "DROP INDEX IF EXISTS product_search_document_idx",
+    "ALTER TABLE product_product DROP COLUMN IF EXISTS search_document",
+]
+
+
+def search_terms(query):
+    """
+    The words of a search, lowercased. Punctuation is dropped, so what is left is safe in an FTS query.
+    """
+    return re.findall(r'\w+', query.lower())[:SEARCH_MAX_TERMS]
+
+
+def searchable(terms):
+    """
+    Whether the first word is long enough to search for.
+    """
+    return bool(terms) and len(terms[0]) >= SEARCH_MIN_PREFIX
+
+
+def _sqlite_search_objects(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE name IN (%s, %s, %s, %s)",
+                       [SEARCH_TABLE, *SQLITE_SEARCH_TRIGGERS])
+        return {name for name, in cursor.fetchall()}
+
+
+@lru_cache(maxsize=None)
+def sqlite_search_available(alias):
+    # SQLite builds without FTS5 skip the index in the migration, and an index
+    # whose triggers were dropped with a table rebuild has gone stale
+    return _sqlite_search_objects(alias) == {SEARCH_TABLE, *SQLITE_SEARCH_TRIGGERS}
+
+
+def _after(position, score='score', key='id'):
+    if position is None:
+        return "", []
+    rank, product_id = position
+    return f"WHERE {score} > %s OR ({score} = %s AND {key} > %s)", [rank, rank, product_id]
+
+
+def _sqlite_search(terms, position, limit):
+    match = " ".join(f'"{term}"*' for term in terms)
+    after, after_params = _after(position)
+    sql = f"""
+        SELECT id, score FROM (
+            SELECT rowid AS id, {SQLITE_RANK} AS score FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s
+        ) {after}
+        ORDER BY score, id LIMIT %s"""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, *after_params, limit])
+        return cursor.fetchall()
+
+
+def _postgres_search(terms, position, limit):
+    tsquery = " & ".join(f"{term}:*" for term in terms)
+    after, after_params = _after(position)
+    # Lower scores rank first, as with bm25 on SQLite
+    sql = f"""
+        SELECT id, score FROM (
+            SELECT id, -{POSTGRES_RANK} AS score
+            FROM product_product, to_tsquery('simple', %s) AS query
+            WHERE {POSTGRES_DOCUMENT} @@ query
+        ) AS matches {after}
+        ORDER BY score, id LIMIT %s"""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [tsquery, *after_params, limit])
+        return cursor.fetchall()
+
+
+def _scan_search(terms, position, limit):
+    # Without a search index every product is matched with LIKE and ranked alike
+    products = Product.objects.all()
+    for term in terms:
+        products = products.filter(Q(product_name__icontains=term) | Q(category__icontains=term))
+    if position is not None:
+        products = products.filter(pk__gt=position[1])
+    return [(product_id, 0.0) for product_id in products.order_by('pk').values_list('pk', flat=True)[:limit]]
+
+
+def search_backend():
+    if connection.vendor == 'postgresql':
+        return _postgres_search
+    if connection.vendor == 'sqlite' and sqlite_search_available(connection.alias):
+        return _sqlite_search
+    return _scan_search
+
+
+def search_products(query, position=None, limit=20):
+    """
+    Ids and ranks of the products whose name or category contain words
+    starting with every word of `query`, best match first, as
+    `[{'id', 'rank'}, ...]`. `position` is the `(rank, id)` of the last
+    result of the previous page. Nothing is found until the first word has
+    `SEARCH_MIN_PREFIX` characters.
+    """
+    terms = search_terms(query)
+    if not searchable(terms):
+        return []
+    return [{'id': product_id, 'rank': rank} for product_id, rank in search_backend()(terms, position, limit)]
+
+
+def install_search_index(schema_editor):
+    """
+    Create the search index for the database's vendor.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for statement in POSTGRES_SEARCH_SETUP:
+            schema_editor.execute(statement)
+    elif vendor == 'sqlite':
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                for statement in SQLITE_SEARCH_SETUP:
+                    schema_editor.execute(statement)
+        except OperationalError:
+            # SQLite built without FTS5: search falls back to scanning
+            pass
+    sqlite_search_available.cache_clear()
+
+
+def repair_search_index(alias):
+    """
+    Reinstall the SQLite search index if its triggers are missing and reindex
+    every product, as writes made without the triggers never reached it.
+    Django rebuilds a SQLite table to alter it, which drops its triggers, so
+    this runs after every migrate. Returns whether the index was repaired.
+    """
+    repaired = False
+    if connections[alias].vendor == 'sqlite':
+        installed = _sqlite_search_objects(alias)
+        if SEARCH_TABLE in installed and not installed.issuperset(SQLITE_SEARCH_TRIGGERS):
+            with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+                for statement in SQLITE_SEARCH_TEARDOWN + SQLITE_SEARCH_SETUP:
+                    cursor.execute(statement)
+            repaired = True
+    # Migrations may also have added or removed the index
+    sqlite_search_available.cache_clear()
+    return repaired
+
+
+def drop_search_index(schema_editor):
+    teardown = {'postgresql': POSTGRES_SEARCH_TEARDOWN, 'sqlite': SQLITE_SEARCH_TEARDOWN}
+    for statement in teardown.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+    sqlite_search_available.cache_clear()
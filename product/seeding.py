@@ -0,0 +1,64 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from .models import (Product, UnitMeasurement, ProductBatch, SalesRecord, StockMovement, PRODUCT_CATEGORY,
+                     UNIT_CHOICES)
+from .utils import bump_catalogue_version
+
+
+def seed_dataset(products, batches_per_product=0, sales_per_product=0, days=365, chunk_size=5000, seed=0):
+    """
+    Bulk-insert a synthetic catalogue with unit measurements, stock batches and
+    sales spread over the last `days` days, one product chunk at a time so
+    memory stays bounded however large the dataset is. Signals do not fire;
+    total_quantity and the batches' ledger receipts are written directly. Returns the created product ids.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    categories = [value for value, _ in PRODUCT_CATEGORY]
+    unit_types = [value for value, _ in UNIT_CHOICES]
+    product_ids = []
+
+    for start in range(0, products, chunk_size):
+        with transaction.atomic():
+            chunk = Product.objects.bulk_create([
+                Product(product_name=f"Seed product {i}",
+                        cost_price=Decimal(rng.randint(100, 10000)) / 100,
+                        category=categories[i % len(categories)],
+                        total_quantity=batches_per_product * 50)
+                for i in range(start, min(start + chunk_size, products))
+            ])
+            UnitMeasurement.objects.bulk_create([
+                UnitMeasurement(product=product, unit_type=unit_type,
+                                selling_price=product.cost_price * multiple)
+                for product in chunk
+                for unit_type, multiple in zip(unit_types[:2], (Decimal("1.5"), Decimal("20")))
+            ], batch_size=chunk_size)
+            batches = ProductBatch.objects.bulk_create(
+                (ProductBatch(product=product, quantity=50, cost_price=product.cost_price)
+                 for product in chunk for _ in range(batches_per_product)),
+                batch_size=chunk_size,
+            )
+            StockMovement.objects.bulk_create(
+                (StockMovement.for_batch(batch, 'receipt', batch.quantity) for batch in batches),
+                batch_size=chunk_size,
+            )
+            sales = SalesRecord.objects.bulk_create(
+                (SalesRecord(product=product, unit_type=unit_types[0], quantity=1,
+                             revenue=product.cost_price * Decimal("1.5"), cost=product.cost_price,
+                             profit=product.cost_price * Decimal("0.5"))
+                 for product in chunk for _ in range(sales_per_product)),
+                batch_size=chunk_size,
+            )
+            # auto_now_add stamps every row with the same moment; spread them out
+            if sales:
+                for day in range(days):
+                    SalesRecord.objects.filter(
+                        pk__in=[sale.pk for sale in sales[day::days]]
+                    ).update(sale_date=now - timedelta(days=day, seconds=rng.randint(0, 86399)))
+            product_ids.extend(product.pk for product in chunk)
+
+    bump_catalogue_version()
+    return product_ids
@@ -1,6 +1,7 @@
 from rest_framework import serializers
+from .instrumentation import InstrumentedSerializerMixin
 from .models import (Product, UnitMeasurement,
-                    ProductBatch, SalesRecord)
+                    ProductBatch, SalesRecord, LowStockEvent)
 
 class UnitMeasurementSerializer(serializers.ModelSerializer):
 
@@ -14,6 +15,14 @@ class AddProductQuantitySerializer(serializers.Serializer):
     quantity = serializers.IntegerField(min_value=1, required=True)
 
 
+class BulkAddProductQuantitySerializer(AddProductQuantitySerializer):
+    product_id = serializers.IntegerField()
+
+
+class ReorderLevelSerializer(serializers.Serializer):
+    reorder_level = serializers.IntegerField(min_value=0)
+
+
 class SellProductUnitSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
     unit_type = serializers.CharField(max_length=50)  # Unit type (e.g., 'carton', 'piece', etc.)
@@ -25,7 +34,7 @@ class SellProductSerializer(serializers.Serializer):
     products = SellProductUnitSerializer(many=True)
 
 
-class SalesRecordSerializer(serializers.ModelSerializer):
+class SalesRecordSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.product_name', read_only=True)
 
     class Meta:
@@ -33,7 +42,7 @@ class SalesRecordSerializer(serializers.ModelSerializer):
         fields = ['product_name', 'unit_type', 'quantity', 'revenue', 'cost', 'profit', 'sale_date']
 
 
-class RetrieveProductBatchesSerializer(serializers.ModelSerializer):
+class RetrieveProductBatchesSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     added_on = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")
 
     class Meta:
@@ -41,16 +50,37 @@ class RetrieveProductBatchesSerializer(serializers.ModelSerializer):
         fields = ['product', 'quantity', 'cost_price', 'added_on']
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class LowStockProductSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Product
+        fields = ['id', 'product_name', 'total_quantity', 'reorder_level', 'low_stock_since']
+
+
+class LowStockEventSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.product_name', read_only=True)
+
+    class Meta:
+        model = LowStockEvent
+        fields = ['id', 'product', 'product_name', 'event', 'total_quantity', 'reorder_level', 'created_at']
+
+
+class ProductSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     unit_measurements  = UnitMeasurementSerializer(many=True, required=True)
     timestamp = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S", read_only=True)
 
     class Meta:
         model = Product
-        fields = ['id', 'product_name', 'total_quantity',
+        fields = ['id', 'product_name', 'total_quantity', 'reorder_level',
                 'cost_price', 'category', 'timestamp', 'unit_measurements']
         read_only_fields = ['timestamp', 'total_quantity']
 
+    def validate_unit_measurements(self, value):
+        unit_types = [unit['unit_type'] for unit in value]
+        if len(unit_types) != len(set(unit_types)):
+            raise serializers.ValidationError("Each unit type can only be listed once per product.")
+        return value
+
     # Create method to handle nested creation of UnitMeasurement
     def create(self, validated_data):
         unit_measurements_data = validated_data.pop('unit_measurements', [])
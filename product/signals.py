@@ -1,10 +1,108 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_init, post_migrate, post_save, post_delete
 from django.dispatch import receiver
-from .models import ProductBatch
-from .utils import compute_total_quantity
+from .ledger import batch_ledger_quantity
+from .models import Product, ProductBatch, StockMovement, UnitMeasurement
+from .search import repair_search_index
+from .unit_prices import invalidate_unit_prices
+from .valuation import invalidate_inventory_valuation
+from .utils import (adjust_total_quantity, bump_catalogue_version, bump_product_versions, compute_total_quantity,
+                    sync_low_stock, total_quantity_sync_is_suspended)
+
+
+@receiver(post_init, sender=ProductBatch)
+def remember_batch_quantity(sender, instance, **kwargs):
+    # The quantity last written to the database, so a save only applies the difference.
+    # None when the field was deferred and the previous value is unknown.
+    instance._synced_quantity = instance.__dict__.get('quantity') if instance.pk else 0
+    instance._synced_cost_price = instance.__dict__.get('cost_price')
+
+
+def record_batch_movement(batch, kind, previous, repriced=False):
+    # Single-row batch writes go to the ledger here; bulk writes append their own movements
+    if previous is None:
+        previous = batch_ledger_quantity(batch.product_id, batch.pk)
+    if batch.quantity != previous or repriced:
+        StockMovement.objects.create(product_id=batch.product_id, batch_id=batch.pk, kind=kind,
+                                     quantity=batch.quantity - previous, cost_price=batch.cost_price)
+
 
 @receiver(post_save, sender=ProductBatch)
+def add_batch_quantity(sender, instance, created, **kwargs):
+    previous = 0 if created else instance._synced_quantity
+    previous_cost_price = instance._synced_cost_price
+    instance._synced_quantity = instance.quantity
+    instance._synced_cost_price = instance.cost_price
+    if total_quantity_sync_is_suspended():
+        return
+    record_batch_movement(instance, 'receipt' if created else 'adjustment', previous,
+                          repriced=not created and instance.cost_price != previous_cost_price)
+    if previous is None:
+        compute_total_quantity(instance.product)
+    elif instance.quantity != previous:
+        adjust_total_quantity(instance.product_id, instance.quantity - previous)
+    else:
+        # A cost_price edit leaves the quantity alone but still changes the stock's value
+        bump_product_versions([instance.product_id])
+        invalidate_inventory_valuation()
+
+
+def deleted_with_product(origin):
+    # A product delete cascades to its batches; the product row is going too,
+    # so there is no total_quantity or low-stock mark left to keep in step
+    return isinstance(origin, Product) or getattr(origin, 'model', None) is Product
+
+
 @receiver(post_delete, sender=ProductBatch)
-def update_total_quantity(sender, instance, **kwargs):
-    product = instance.product
-    compute_total_quantity(product)
+def remove_batch_quantity(sender, instance, origin=None, **kwargs):
+    if total_quantity_sync_is_suspended():
+        return
+    removed = instance._synced_quantity
+    if removed is None:
+        removed = batch_ledger_quantity(instance.product_id, instance.pk)
+    # The row is gone, so a deferred cost cannot be loaded; the ledger already has it
+    cost_price = instance._synced_cost_price
+    if removed and cost_price is None:
+        cost_price = (StockMovement.objects.filter(product_id=instance.product_id, batch_id=instance.pk)
+                      .order_by('-created_at', '-id').values_list('cost_price', flat=True).first())
+    if removed:
+        StockMovement.objects.create(product_id=instance.product_id, batch_id=instance.pk, kind='adjustment',
+                                     quantity=-removed, cost_price=cost_price)
+    if deleted_with_product(origin):
+        return
+    if instance._synced_quantity is None:
+        compute_total_quantity(instance.product)
+    else:
+        adjust_total_quantity(instance.product_id, -instance._synced_quantity)
+
+
+@receiver(post_save, sender=UnitMeasurement)
+@receiver(post_delete, sender=UnitMeasurement)
+def forget_unit_prices(sender, instance, **kwargs):
+    invalidate_unit_prices([instance.product_id])
+    bump_product_versions([instance.product_id])
+
+
+@receiver(post_save, sender=Product)
+def bump_product_version(sender, instance, created, **kwargs):
+    if created:
+        bump_catalogue_version()
+    else:
+        bump_product_versions([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def bump_catalogue_on_delete(sender, instance, **kwargs):
+    bump_catalogue_version()
+
+
+@receiver(post_save, sender=Product)
+def track_low_stock(sender, instance, **kwargs):
+    # A new product or a changed reorder level can cross the threshold without any stock moving
+    sync_low_stock([instance.pk])
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    # A migration that altered the product table on SQLite rebuilt it without the search triggers
+    if sender.name == 'product':
+        repair_search_index(using)
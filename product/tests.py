@@ -1,3 +1,1132 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock, skipUnless
+from datetime import timedelta
+from decimal import Decimal
+import numpy as np
+from django.db import IntegrityError, connection
+from django.db.models import F, Sum
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from . import catalogue_import, unit_prices
+from .analytics import compute_velocity
+from .catalogue_import import csv_rows, import_products
+from .compaction import compact_product_batches
+from .ledger import replay_stock, take_stock_snapshot
+from .instrumentation import registry, sql_shape
+from .models import (Product, UnitMeasurement, ProductBatch, SalesRecord, DailySalesRollup, IdempotencyKey,
+                     ProductBatchArchive, LowStockEvent)
+from .read_serializers import ProductBatchListSerializer, ProductListSerializer, SalesRecordListSerializer
+from .search import _scan_search, _sqlite_search, search_backend, sqlite_search_available
+from .serializers import ProductSerializer, RetrieveProductBatchesSerializer, SalesRecordSerializer
+from .utils import LOW_STOCK_EVENT_SETTLE_TIME, bump_catalogue_version, sync_low_stock
+from .views import product_batches_queryset, product_list_queryset, sales_history_queryset
 
-# Create your tests here.
+
+def create_stocked_product(batch_count, batch_quantity=10, name="Paracetamol"):
+    product = Product.objects.create(product_name=name, cost_price=Decimal("5.00"), category="drugs")
+    UnitMeasurement.objects.create(product=product, unit_type="piece", selling_price=Decimal("8.00"))
+    ProductBatch.objects.bulk_create([
+        ProductBatch(product=product, quantity=batch_quantity, cost_price=Decimal(5 + i))
+        for i in range(batch_count)
+    ])
+    Product.objects.filter(pk=product.pk).update(total_quantity=batch_count * batch_quantity)
+    return product
+
+
+class ConstantQueryCountMixin:
+    """
+    Asserts that a listing costs the same number of queries however many rows it returns.
+    """
+
+    def assertConstantQueryCount(self, url, seed, small=10, large=10_000):
+        seed(small)
+        with CaptureQueriesContext(connection) as small_queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        seed(large - small)
+        with CaptureQueriesContext(connection) as large_queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.assertEqual(
+            len(small_queries), len(large_queries),
+            f"{url} ran {len(small_queries)} queries for {small} rows but {len(large_queries)} for {large}"
+        )
+
+
+class ListingQueryCountTests(ConstantQueryCountMixin, TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def seed_products(self, count):
+        products = Product.objects.bulk_create([
+            Product(product_name=f"Item {i}", cost_price=Decimal("1.00"), category="food")
+            for i in range(count)
+        ])
+        UnitMeasurement.objects.bulk_create([
+            UnitMeasurement(product=product, unit_type=unit_type, selling_price=Decimal("2.00"))
+            for product in products for unit_type in ("piece", "carton")
+        ])
+        # Bulk writes skip the signals, so they move the catalogue version themselves
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_catalogue_version()
+
+    def seed_sales(self, count):
+        product = create_stocked_product(batch_count=0)
+        SalesRecord.objects.bulk_create([
+            SalesRecord(product=product, unit_type="piece", quantity=1, revenue=Decimal("8.00"),
+                        cost=Decimal("5.00"), profit=Decimal("3.00"))
+            for _ in range(count)
+        ])
+
+    def test_product_list(self):
+        self.assertConstantQueryCount(reverse('product-list-create'), self.seed_products)
+
+    def test_sales_history(self):
+        self.assertConstantQueryCount(reverse('sales-history'), self.seed_sales)
+
+
+class ReadSerializerTests(TestCase):
+
+    def assertRendersLike(self, fast_serializer, model_serializer, queryset):
+        renderer = JSONRenderer()
+        expected = renderer.render(model_serializer(queryset, many=True).data)
+        self.assertEqual(renderer.render(fast_serializer(list(fast_serializer.values(queryset))).data), expected)
+
+    def test_list_serializers_render_identical_json(self):
+        product = create_stocked_product(batch_count=3)
+        UnitMeasurement.objects.create(product=product, unit_type="carton", selling_price=Decimal("90.50"))
+        create_stocked_product(batch_count=1, name="Ibuprofen")
+        SalesRecord.objects.create(product=product, unit_type="piece", quantity=2, revenue=Decimal("16.00"),
+                                   cost=Decimal("10.00"), profit=Decimal("6.00"))
+        SalesRecord.objects.create(product=product, unit_type="carton", quantity=1, revenue=Decimal("90.50"),
+                                   cost=Decimal("60.25"), profit=Decimal("30.25"))
+        SalesRecord.objects.filter(unit_type="carton").update(sale_date=timezone.now().replace(microsecond=0))
+
+        self.assertRendersLike(ProductListSerializer, ProductSerializer, product_list_queryset({}))
+        self.assertRendersLike(SalesRecordListSerializer, SalesRecordSerializer, sales_history_queryset({}))
+        self.assertRendersLike(ProductBatchListSerializer, RetrieveProductBatchesSerializer,
+                               product_batches_queryset(product.pk))
+
+
+class SalesHistoryPaginationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_walks_every_sale_once_across_identical_timestamps(self):
+        product = create_stocked_product(batch_count=0)
+        other = create_stocked_product(batch_count=0, name="Other")
+        records = SalesRecord.objects.bulk_create([
+            SalesRecord(product=product if i % 2 else other, unit_type="piece", quantity=i,
+                        revenue=Decimal("1.00"), cost=Decimal("1.00"), profit=Decimal("0.00"))
+            for i in range(25)
+        ])
+        # Give groups of rows the same sale_date so the id tie-breaker matters
+        for i, record in enumerate(records):
+            SalesRecord.objects.filter(pk=record.pk).update(sale_date=record.sale_date.replace(microsecond=0, second=i // 5))
+
+        seen = []
+        url = reverse('sales-history') + f"?page_size=4&product={product.pk}"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 4)
+            seen.extend(row['quantity'] for row in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(sorted(seen), [i for i in range(25) if i % 2])
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_rejects_bad_cursor_and_dates(self):
+        self.assertEqual(self.client.get(reverse('sales-history') + "?cursor=garbage").status_code, 404)
+        self.assertEqual(self.client.get(reverse('sales-history') + "?date_from=yesterday").status_code, 400)
+
+
+class SalesExportTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.product = create_stocked_product(batch_count=0)
+        SalesRecord.objects.bulk_create([
+            SalesRecord(product=self.product, unit_type="piece", quantity=i, revenue=Decimal("8.00"),
+                        cost=Decimal("5.00"), profit=Decimal("3.00"))
+            for i in range(1, 4)
+        ])
+
+    def test_streams_csv(self):
+        response = self.client.get(reverse('sales-export'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "id,product_id,product_name,unit_type,quantity,revenue,cost,profit,sale_date")
+        self.assertEqual(len(lines), 4)
+        self.assertIn(",Paracetamol,piece,1,8.00,5.00,3.00,", lines[1])
+
+    def test_command_writes_ndjson(self):
+        out = StringIO()
+        call_command('export_sales', '--format', 'ndjson', '--product', str(self.product.pk), stdout=out)
+
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['quantity'] for row in rows], [1, 2, 3])
+        self.assertEqual(rows[0]['profit'], "3.00")
+
+
+class AsyncReadViewTests(TestCase):
+
+    def setUp(self):
+        self.product = create_stocked_product(batch_count=3)
+        SalesRecord.objects.bulk_create([
+            SalesRecord(product=self.product, unit_type="piece", quantity=i, revenue=Decimal("8.00"),
+                        cost=Decimal("5.00"), profit=Decimal("3.00"))
+            for i in range(1, 6)
+        ])
+
+    def without_links(self, response):
+        # Pagination links differ only by the /async/ prefix
+        body = json.loads(response.content)
+        if isinstance(body, dict):
+            body.pop('next', None)
+            body.pop('first', None)
+        return body
+
+    async def test_async_reads_match_sync_views(self):
+        pairs = [
+            (reverse('product-list-create'), reverse('async-product-list')),
+            (reverse('single-product', args=[self.product.pk]), reverse('async-single-product', args=[self.product.pk])),
+            (f"/api/products/{self.product.pk}/product-batches/", reverse('async-product-batches', args=[self.product.pk])),
+            (reverse('sales-history') + "?page_size=2", reverse('async-sales-history') + "?page_size=2"),
+        ]
+        for sync_url, async_url in pairs:
+            expected = await self.async_client.get(sync_url)
+            response = await self.async_client.get(async_url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.without_links(response), self.without_links(expected))
+
+    async def test_async_errors_match_sync_views(self):
+        missing = await self.async_client.get(reverse('async-single-product', args=[987654]))
+        self.assertEqual(missing.status_code, 404)
+        bad_date = await self.async_client.get(reverse('async-sales-history') + "?date_from=someday")
+        self.assertEqual(bad_date.status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.product = create_stocked_product(batch_count=2)
+
+    def test_unchanged_resources_return_304(self):
+        for url in (reverse('product-list-create'), reverse('single-product', args=[self.product.pk]),
+                    f"/api/products/{self.product.pk}/product-batches/"):
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+
+            with self.assertNumQueries(1):
+                revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(revalidated.status_code, 304)
+            self.assertEqual(revalidated.content, b"")
+
+    def test_writes_change_the_etag(self):
+        url = reverse('single-product', args=[self.product.pk])
+        etag = self.client.get(url)['ETag']
+
+        ProductBatch.objects.create(product=self.product, quantity=3, cost_price=Decimal("4.00"))
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data['total_quantity'], 23)
+
+        etag = changed['ETag']
+        UnitMeasurement.objects.create(product=self.product, unit_type="carton", selling_price=Decimal("90.00"))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_catalogue_revalidation_is_one_indexed_read(self):
+        url = reverse('product-list-create')
+        etag = self.client.get(url)['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        [query] = queries
+        self.assertIn('"product_catalogueversion"', query['sql'])
+        self.assertNotIn('"product_product"', query['sql'])
+
+        for write in (lambda: create_stocked_product(batch_count=0, name="Ibuprofen"),
+                      lambda: Product.objects.get(product_name="Ibuprofen").delete(),
+                      lambda: self.client.post(f"/api/products/{self.product.pk}/add-quantity/",
+                                               {"quantity": 1, "cost_price": "4.00"}, format='json')):
+            with self.captureOnCommitCallbacks(execute=True):
+                write()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+
+    def test_unchanged_body_is_served_from_the_response_cache(self):
+        url = reverse('product-list-create')
+        first = self.client.get(url)
+
+        with self.assertNumQueries(1):
+            again = self.client.get(url)
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.content, first.content)
+
+
+class RequestInstrumentationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_reports_timings_logs_and_metrics(self):
+        product = create_stocked_product(batch_count=2)
+        key = ('GET', 'api/products/<int:pk>/', '200')
+        before = registry.requests[key]
+
+        with self.assertLogs('product.requests', level='DEBUG') as logs:
+            response = self.client.get(reverse('single-product', args=[product.pk]))
+
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, view;dur=')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertGreater(record['queries'], 0)
+        self.assertEqual(record['route'], 'api/products/<int:pk>/')
+
+        self.assertEqual(registry.requests[key], before + 1)
+        with self.settings(METRICS_TOKEN='s3cret'):
+            metrics = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret').content.decode()
+        self.assertIn(f'http_requests_total{{method="GET",route="api/products/<int:pk>/",status="200"}} {before + 1}', metrics)
+        self.assertIn('http_request_sql_queries_bucket', metrics)
+
+    def test_metrics_need_the_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        with self.settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+            self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+            self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+
+    def test_sql_shape_ignores_parameters(self):
+        self.assertEqual(sql_shape("SELECT * FROM t WHERE id IN (%s, %s, %s) AND n = 3"),
+                         sql_shape("SELECT * FROM t WHERE id IN (%s, %s) AND n = 7"))
+
+
+class ProductSearchTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def search(self, query, **params):
+        return self.client.get(reverse('product-search'), {"q": query, **params})
+
+    def names(self, query, **params):
+        return [product['product_name'] for product in self.search(query, **params).data['results']]
+
+    def test_matches_word_prefixes_in_name_and_category(self):
+        for name, category in [("Paracetamol 500mg", "drugs"), ("Panadol Extra", "drugs"),
+                               ("Parachute Coconut Oil", "cosmetics"), ("Rice", "food")]:
+            create_stocked_product(batch_count=1, name=name)
+            Product.objects.filter(product_name=name).update(category=category)
+
+        self.assertEqual(sorted(self.names("para")), ["Paracetamol 500mg", "Parachute Coconut Oil"])
+        self.assertEqual(self.names("pan EXT"), ["Panadol Extra"])
+        self.assertEqual(sorted(self.names("drugs")), ["Panadol Extra", "Paracetamol 500mg"])
+        self.assertEqual(self.search("  ").status_code, 400)
+        # Only the first word must be long enough to narrow the catalogue
+        self.assertEqual(self.search("pa").status_code, 400)
+        self.assertEqual(self.names("paracetamol 5"), ["Paracetamol 500mg"])
+
+        with CaptureQueriesContext(connection) as queries:
+            [product] = self.search("rice").data['results']
+        self.assertEqual(product['unit_measurements'], [{"unit_type": "piece", "selling_price": "8.00"}])
+        self.assertEqual(len(queries), 3)
+
+    def test_pages_follow_the_ranking(self):
+        for i in range(5):
+            create_stocked_product(batch_count=0, name=f"Vitamin C {'vitamin ' * i}tablets")
+        ranked = self.names("vitamin")
+
+        paged = []
+        response = self.search("vitamin", page_size=2)
+        while True:
+            paged += [product['product_name'] for product in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(paged, ranked)
+        self.assertEqual(ranked[0], "Vitamin C vitamin vitamin vitamin vitamin tablets")
+
+    def test_index_follows_product_writes(self):
+        import_products(csv_rows([b"product_name,cost_price,category\n", b"Ginger Tea,2.00,food\n"]))
+        self.assertEqual(self.names("ging"), ["Ginger Tea"])
+
+        product = Product.objects.get(product_name="Ginger Tea")
+        product.product_name = "Green Tea"
+        product.save()
+        Product.objects.filter(pk=product.pk).update(total_quantity=5)
+        self.assertEqual((self.names("ging"), self.names("gree")), ([], ["Green Tea"]))
+
+        product.delete()
+        self.assertEqual(self.names("tea"), [])
+
+    @skipUnless(connection.vendor == 'sqlite', "The triggers only exist on SQLite")
+    def test_migrate_restores_triggers_dropped_by_a_table_rebuild(self):
+        self.addCleanup(sqlite_search_available.cache_clear)
+        product = create_stocked_product(batch_count=0, name="Ginger Tea")
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER product_search_update")
+        sqlite_search_available.cache_clear()
+        Product.objects.filter(pk=product.pk).update(product_name="Green Tea")
+
+        # Without its triggers the index is stale, so search scans instead
+        self.assertIs(search_backend(), _scan_search)
+        self.assertEqual(self.names("gree"), ["Green Tea"])
+
+        emit_post_migrate_signal(verbosity=0, interactive=False, db=connection.alias)
+
+        self.assertIs(search_backend(), _sqlite_search)
+        self.assertEqual((self.names("ging"), self.names("gree")), ([], ["Green Tea"]))
+
+
+class StockLedgerTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.product = Product.objects.create(product_name="Ibuprofen", cost_price=Decimal("5.00"), category="drugs")
+        UnitMeasurement.objects.create(product=self.product, unit_type="piece", selling_price=Decimal("9.00"))
+
+    def receive(self, quantity, cost_price):
+        self.client.post(f"/api/products/{self.product.pk}/add-quantity/",
+                         {"quantity": quantity, "cost_price": cost_price}, format='json')
+
+    def sell(self, quantity):
+        return self.client.post(reverse('sell-product'), {"products": [{
+            "product_id": self.product.pk, "unit_type": "piece", "quantity": quantity, "selling_price": "9.00",
+        }]}, format='json')
+
+    def history(self, **params):
+        return self.client.get(reverse('stock-history'), params).data
+
+    def test_replays_stock_and_cogs_at_past_moments(self):
+        self.receive(10, "5.00")
+        self.receive(10, "6.00")
+        received = timezone.now()
+        self.sell(15)
+        sold = timezone.now()
+        self.receive(5, "7.00")
+
+        before_sale = self.history(at=received.isoformat())
+        self.assertEqual((before_sale['total_quantity'], before_sale['total_value']), (20, Decimal("110.00")))
+        after_sale = self.history(at=sold.isoformat(), date_from=received.isoformat())
+        self.assertEqual((after_sale['total_quantity'], after_sale['total_value']), (5, Decimal("30.00")))
+        self.assertEqual(after_sale['cost_of_goods_sold'], SalesRecord.objects.get().cost)
+
+        take_stock_snapshot(sold)
+        now = self.history()
+        self.assertEqual((now['snapshot'], now['movements_replayed']), (sold, 1))
+        self.assertEqual((now['total_quantity'], now['total_value']), (10, Decimal("65.00")))
+        self.assertEqual(self.history(at=received.isoformat())['total_quantity'], 20)
+
+    def test_ledger_follows_compaction_and_direct_batch_edits(self):
+        for cost_price in ("5.00", "5.00", "6.00", "6.00"):
+            self.receive(10, cost_price)
+        self.sell(12)
+        compact_product_batches([self.product.pk])
+        newest = ProductBatch.objects.latest('added_on')
+        newest.quantity = 3
+        newest.cost_price = Decimal("6.50")
+        newest.save()
+        ProductBatch.objects.filter(pk=ProductBatch.objects.earliest('added_on').pk).delete()
+        call_command('snapshot_stock', as_of=timezone.now().isoformat(), stdout=StringIO())
+
+        replay = replay_stock(timezone.now())
+        live = {(batch.product_id, batch.pk): [batch.quantity, batch.cost_price] for batch in ProductBatch.objects.all()}
+        self.assertEqual(replay.batches, live)
+        self.assertEqual(replay.movements, 0)
+
+
+class SalesVelocityTests(TestCase):
+
+    def add_daily_sales(self, product, quantities, unit_type="piece", days_ago=0):
+        today = timezone.localdate()
+        DailySalesRollup.objects.bulk_create([
+            DailySalesRollup(product=product, unit_type=unit_type, day=today - timedelta(days=days_ago + i),
+                             sale_count=1, quantity=quantity)
+            for i, quantity in enumerate(quantities)
+        ])
+
+    def test_days_of_cover_are_ranked_from_recent_sales(self):
+        fast = create_stocked_product(batch_count=3, name="Fast")
+        slow = create_stocked_product(batch_count=10, name="Slow")
+        stale = create_stocked_product(batch_count=1, name="Stale")
+        self.add_daily_sales(fast, [3] * 10)
+        self.add_daily_sales(fast, [1] * 10, unit_type="carton")
+        self.add_daily_sales(slow, [2] * 28)
+        self.add_daily_sales(stale, [5] * 10, days_ago=40)
+
+        response = self.client.get(reverse('sales-velocity'))
+
+        self.assertEqual(response.status_code, 200)
+        rows = {row['product_name']: row for row in response.data['results']}
+        self.assertEqual([row['product_name'] for row in response.data['results']], ["Fast", "Slow", "Stale"])
+        self.assertEqual((rows["Fast"]['units_sold'], rows["Fast"]['velocity_7d'], rows["Fast"]['days_of_cover']),
+                         (40, 4.0, 21.0))
+        self.assertEqual(rows["Fast"]['stockout_date'], timezone.localdate() + timedelta(days=21))
+        self.assertEqual((rows["Slow"]['velocity_28d'], rows["Slow"]['days_of_cover']), (2.0, 50.0))
+        self.assertEqual((rows["Stale"]['velocity_90d'], rows["Stale"]['days_of_cover']), (0.56, None))
+
+        urgent = self.client.get(reverse('sales-velocity'), {"max_cover": 30, "days": 30})
+        self.assertEqual([row['product_name'] for row in urgent.data['results']], ["Fast"])
+        self.assertEqual(self.client.get(reverse('sales-velocity'), {"days": 0}).status_code, 400)
+
+    def test_filtered_reports_only_read_their_products_sales(self):
+        wanted = create_stocked_product(batch_count=1, name="Wanted")
+        other = create_stocked_product(batch_count=1, name="Other")
+        self.add_daily_sales(wanted, [2] * 5)
+        self.add_daily_sales(other, [3] * 5)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('sales-velocity'), {"product": wanted.pk})
+
+        self.assertEqual([row['units_sold'] for row in response.data['results']], [10])
+        [rollup] = [query['sql'] for query in queries if 'product_dailysalesrollup' in query['sql']]
+        self.assertIn('"product_dailysalesrollup"."product_id" IN (SELECT', rollup)
+
+    def test_cover_past_the_calendar_has_no_stockout_date(self):
+        product = create_stocked_product(batch_count=1, batch_quantity=500000)
+        self.add_daily_sales(product, [1])
+
+        response = self.client.get(reverse('sales-velocity'))
+
+        self.assertEqual(response.status_code, 200)
+        [row] = response.data['results']
+        self.assertEqual((row['days_of_cover'], row['stockout_date']), (14000000.0, None))
+
+    def test_windows_shorter_than_the_history_average_its_last_days(self):
+        matrix = np.array([[1, 1, 1, 4, 4], [0, 0, 0, 0, 0]])
+
+        metrics = compute_velocity(matrix, np.array([12, 5]), windows=(2,), cover_window=2)
+
+        self.assertEqual(metrics['velocity_2d'].tolist(), [4.0, 0.0])
+        self.assertEqual(metrics['avg_daily_units'].tolist(), [2.2, 0.0])
+        self.assertEqual(metrics['days_of_cover'].tolist(), [3.0, float('inf')])
+
+
+class LowStockTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def settle_events(self, **filters):
+        LowStockEvent.objects.filter(**filters).update(created_at=F('created_at') - LOW_STOCK_EVENT_SETTLE_TIME)
+
+    def sell(self, product, quantity):
+        return self.client.post(reverse('sell-product'), {"products": [{
+            "product_id": product.pk, "unit_type": "piece", "quantity": quantity, "selling_price": "8.00",
+        }]}, format='json')
+
+    def test_crossing_the_reorder_level_is_tracked_both_ways(self):
+        product = create_stocked_product(batch_count=2)
+        create_stocked_product(batch_count=2, name="Untracked")
+        response = self.client.put(reverse('reorder-level', args=[product.pk]), {"reorder_level": 5}, format='json')
+        self.assertEqual((response.status_code, response.data['low_stock']), (200, False))
+
+        self.sell(product, 14)
+        self.assertEqual(self.client.get(reverse('low-stock')).data['results'], [])
+
+        self.sell(product, 1)
+        [row] = self.client.get(reverse('low-stock')).data['results']
+        self.assertEqual((row['id'], row['total_quantity'], row['reorder_level']), (product.pk, 5, 5))
+
+        self.client.post(f"/api/products/{product.pk}/add-quantity/", {"quantity": 20, "cost_price": "4.00"},
+                         format='json')
+        self.assertEqual(self.client.get(reverse('low-stock')).data['results'], [])
+
+        self.settle_events()
+        events = self.client.get(reverse('low-stock-events')).data
+        self.assertEqual([(e['event'], e['total_quantity']) for e in events['results']], [("low", 5), ("restocked", 25)])
+        later = self.client.get(reverse('low-stock-events'), HTTP_LAST_EVENT_ID=str(events['results'][0]['id']))
+        self.assertEqual([e['event'] for e in later.data['results']], ["restocked"])
+
+    def test_events_stream_as_server_sent_events(self):
+        product = create_stocked_product(batch_count=1)
+        Product.objects.filter(pk=product.pk).update(reorder_level=20)
+        sync_low_stock([product.pk])
+        self.settle_events()
+
+        response = self.client.get(reverse('low-stock-events'), HTTP_ACCEPT='text/event-stream')
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+        event = LowStockEvent.objects.get()
+        self.assertIn(f"id: {event.pk}\nevent: low\ndata: ", response.content.decode())
+
+    def test_events_wait_for_earlier_ids_to_settle(self):
+        first, second = (create_stocked_product(batch_count=1, name=name) for name in ("First", "Second"))
+        for product in (first, second):
+            Product.objects.filter(pk=product.pk).update(reorder_level=20)
+            sync_low_stock([product.pk])
+        # The later event settled first, as when its transaction committed before the earlier one's
+        self.settle_events(product=second)
+
+        pending = self.client.get(reverse('low-stock-events')).data
+        self.assertEqual((pending['results'], pending['last_event_id']), ([], 0))
+
+        self.settle_events(product=first)
+        settled = self.client.get(reverse('low-stock-events')).data
+        self.assertEqual([event['product'] for event in settled['results']], [first.pk, second.pk])
+
+    def test_deleting_a_product_across_its_reorder_level(self):
+        for delete in (lambda product: product.delete(), lambda product: Product.objects.filter(pk=product.pk).delete()):
+            product = Product.objects.create(product_name="Paracetamol", cost_price=Decimal("5.00"), category="drugs",
+                                             reorder_level=5)
+            ProductBatch.objects.create(product=product, quantity=4, cost_price=Decimal("5.00"))
+            ProductBatch.objects.create(product=product, quantity=6, cost_price=Decimal("6.00"))
+
+            delete(product)
+
+            connection.check_constraints()
+            self.assertFalse(Product.objects.filter(pk=product.pk).exists())
+            self.assertFalse(LowStockEvent.objects.filter(product_id=product.pk).exists())
+
+    def test_low_stock_list_reads_only_the_partial_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('low-stock'))
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"low_stock_since" IS NOT NULL', queries[0]['sql'])
+
+
+class ImportProductsTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('import-products')
+
+    def post_ndjson(self, rows, query=""):
+        body = "\n".join(row if isinstance(row, str) else json.dumps(row) for row in rows)
+        return self.client.post(self.url + query, body, content_type='application/x-ndjson')
+
+    def test_imports_ndjson_with_per_line_errors(self):
+        response = self.post_ndjson([
+            {"product_name": "Amoxicillin", "cost_price": "3.00", "category": "drugs",
+             "unit_measurements": [{"unit_type": "piece", "selling_price": "4.50"},
+                                   {"unit_type": "carton", "selling_price": "90.00"}]},
+            "not json",
+            {"product_name": "Rice", "cost_price": "10.00", "category": "weapons", "unit_measurements": []},
+            {"product_name": "Amoxicillin", "cost_price": "3.00", "category": "drugs", "unit_measurements": []},
+        ])
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 3))
+        self.assertEqual([error['line'] for error in response.data['errors']], [2, 3, 4])
+        product = Product.objects.get(product_name="Amoxicillin")
+        self.assertEqual(dict(product.unit_measurements.values_list('unit_type', 'selling_price')),
+                         {"piece": Decimal("4.50"), "carton": Decimal("90.00")})
+
+    def test_upsert_updates_existing_products_by_name(self):
+        product = create_stocked_product(batch_count=1)
+        row = {"product_name": "Paracetamol", "cost_price": "6.00", "category": "drugs",
+               "unit_measurements": [{"unit_type": "piece", "selling_price": "9.00"},
+                                     {"unit_type": "carton", "selling_price": "100.00"}]}
+
+        self.assertEqual(self.post_ndjson([row]).status_code, 400)
+        response = self.post_ndjson([row], query="?upsert=true")
+
+        self.assertEqual((response.status_code, response.data['updated']), (201, 1))
+        product.refresh_from_db()
+        self.assertEqual((product.cost_price, product.total_quantity), (Decimal("6.00"), 10))
+        self.assertEqual(dict(product.unit_measurements.values_list('unit_type', 'selling_price')),
+                         {"piece": Decimal("9.00"), "carton": Decimal("100.00")})
+
+    def test_query_count_grows_per_chunk_not_per_row(self):
+        def csv_file(prefix, count):
+            lines = ["product_name,cost_price,category,piece_price,carton_price"]
+            lines += [f"{prefix} {i},1.00,food,2.00,{'' if i % 2 else '20.00'}" for i in range(count)]
+            return "\n".join(lines).encode().splitlines(keepends=True)
+
+        with CaptureQueriesContext(connection) as few:
+            import_products(csv_rows(csv_file("Small", 4)))
+        with CaptureQueriesContext(connection) as many:
+            report = import_products(csv_rows(csv_file("Large", 100)))
+
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(report.created, 100)
+        self.assertEqual(UnitMeasurement.objects.filter(product__product_name__startswith="Large").count(), 150)
+
+    def test_a_rejected_chunk_is_reported_and_the_import_goes_on(self):
+        lines = ["product_name,cost_price,category,piece_price"]
+        lines += [f"Item {i},1.00,food,2.00" for i in range(6)]
+        create_products = catalogue_import._create_products
+
+        def reject_second_chunk(entries):
+            if entries[0]['product_name'] == "Item 2":
+                raise IntegrityError("simulated constraint failure")
+            return create_products(entries)
+
+        with mock.patch.object(catalogue_import, '_create_products', reject_second_chunk):
+            report = import_products(csv_rows("\n".join(lines).encode().splitlines(keepends=True)), chunk_size=2)
+
+        self.assertEqual((report.created, report.failed), (4, 2))
+        self.assertEqual([error['line'] for error in report.errors], [4, 5])
+        self.assertIn("simulated constraint failure", report.errors[0]['errors']['non_field_errors'][0])
+        self.assertEqual(sorted(Product.objects.values_list('product_name', flat=True)),
+                         ["Item 0", "Item 1", "Item 4", "Item 5"])
+
+    def test_command_reads_csv(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as source:
+            source.write("product_name,cost_price,category,kg_price\nBeans,2.50,food,3.00\nSalt,,food,1.00\n")
+        self.addCleanup(os.remove, source.name)
+        errors = StringIO()
+
+        call_command('import_products', source.name, stdout=StringIO(), stderr=errors)
+
+        self.assertTrue(Product.objects.filter(product_name="Beans", unit_measurements__unit_type="kg").exists())
+        self.assertIn("line 3", errors.getvalue())
+
+
+class SellProductFifoTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('sell-product')
+
+    def sell(self, product, quantity):
+        return self.client.post(self.url, {"products": [{
+            "product_id": product.pk,
+            "unit_type": "piece",
+            "quantity": quantity,
+            "selling_price": "8.00",
+        }]}, format='json')
+
+    def test_depletes_oldest_batches_first(self):
+        product = create_stocked_product(batch_count=3)
+
+        response = self.sell(product, 25)
+
+        self.assertEqual(response.status_code, 200)
+        # 10 @ 5.00 + 10 @ 6.00 + 5 @ 7.00
+        self.assertEqual(Decimal(response.data["transaction_summary"]["total_cost"]), Decimal("145.00"))
+        remaining = list(ProductBatch.objects.filter(product=product).values_list('quantity', 'cost_price'))
+        self.assertEqual(remaining, [(5, Decimal("7.00"))])
+        product.refresh_from_db()
+        self.assertEqual(product.total_quantity, 5)
+        self.assertEqual(SalesRecord.objects.get(product=product).quantity, 25)
+
+    def test_sales_are_rolled_up_per_day(self):
+        product = create_stocked_product(batch_count=3)
+        self.sell(product, 4)
+        self.sell(product, 10)
+
+        rollup = DailySalesRollup.objects.get(product=product)
+        self.assertEqual((rollup.sale_count, rollup.quantity), (2, 14))
+        self.assertEqual(rollup.revenue, Decimal("112.00"))
+        self.assertEqual(rollup.cost, Decimal("74.00"))
+
+        response = self.client.get(reverse('sales-report') + "?period=month")
+        self.assertEqual(response.status_code, 200)
+        [row] = response.data['results']
+        self.assertEqual((row['product_id'], row['quantity'], row['profit']), (product.pk, 14, Decimal("38.00")))
+
+        DailySalesRollup.objects.all().delete()
+        call_command('backfill_sales_rollup', stdout=StringIO())
+        rebuilt = DailySalesRollup.objects.get(product=product)
+        self.assertEqual((rebuilt.sale_count, rebuilt.quantity, rebuilt.profit), (2, 14, Decimal("38.00")))
+
+    def test_basket_validates_units_with_one_query(self):
+        products = [create_stocked_product(batch_count=10, name=f"Product {i}") for i in range(5)]
+        basket = [{"product_id": products[i % 5].pk, "unit_type": "piece", "quantity": 1, "selling_price": "8.00"}
+                  for i in range(50)]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {"products": basket}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        unit_queries = [q for q in queries if 'product_unitmeasurement' in q['sql']]
+        self.assertLessEqual(len(unit_queries), 1)
+
+    def test_unit_changes_are_seen_by_the_next_sale(self):
+        product = create_stocked_product(batch_count=1)
+        self.assertEqual(self.sell(product, 1).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UnitMeasurement.objects.filter(product=product).delete()
+
+        self.assertEqual(self.sell(product, 1).status_code, 400)
+
+    def test_unit_price_cache_is_bounded(self):
+        products = [create_stocked_product(batch_count=0, name=f"Product {i}").pk for i in range(5)]
+        self.addCleanup(setattr, unit_prices, 'LOCAL_MAX_ENTRIES', unit_prices.LOCAL_MAX_ENTRIES)
+        self.addCleanup(unit_prices._local.clear)
+        unit_prices._local.clear()
+        unit_prices.LOCAL_MAX_ENTRIES = 3
+
+        unit_prices.get_unit_prices(products[:3])
+        unit_prices.get_unit_prices(products[:1])
+        unit_prices.get_unit_prices(products[3:])
+
+        # Products loaded together are cached in whatever order the database returned them
+        self.assertEqual(set(unit_prices._local), {products[0], products[3], products[4]})
+        self.assertEqual(unit_prices.get_unit_prices([products[1]]), {products[1]: {"piece": Decimal("8.00")}})
+
+    def test_repeated_product_continues_where_previous_line_stopped(self):
+        product = create_stocked_product(batch_count=3)
+        line = {"product_id": product.pk, "unit_type": "piece", "quantity": 15, "selling_price": "8.00"}
+
+        response = self.client.post(self.url, {"products": [line, line]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        # 10 @ 5.00 + 5 @ 6.00, then 5 @ 6.00 + 10 @ 7.00
+        self.assertEqual([d["total_cost"] for d in response.data["details"]], [Decimal("80.00"), Decimal("100.00")])
+        self.assertFalse(ProductBatch.objects.filter(product=product).exists())
+        product.refresh_from_db()
+        self.assertEqual(product.total_quantity, 0)
+
+    def test_invalid_line_leaves_the_basket_unsold(self):
+        product = create_stocked_product(batch_count=1)
+
+        response = self.client.post(self.url, {"products": [
+            {"product_id": product.pk, "unit_type": "piece", "quantity": 1, "selling_price": "8.00"},
+            {"product_id": product.pk, "unit_type": "bag", "quantity": 1, "selling_price": "8.00"},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(SalesRecord.objects.exists())
+        product.refresh_from_db()
+        self.assertEqual(product.total_quantity, 10)
+
+    def test_basket_query_count_does_not_grow_with_line_count(self):
+        products = [create_stocked_product(batch_count=5, batch_quantity=100, name=f"Product {i}") for i in range(10)]
+
+        def basket(lines):
+            return {"products": [
+                {"product_id": products[i % 10].pk, "unit_type": "piece", "quantity": 3, "selling_price": "8.00"}
+                for i in range(lines)
+            ]}
+
+        # Warm the unit price cache and create today's rollup rows for every product
+        self.client.post(self.url, basket(10), format='json')
+        with CaptureQueriesContext(connection) as one_line:
+            self.client.post(self.url, basket(1), format='json')
+        with CaptureQueriesContext(connection) as hundred_lines:
+            self.client.post(self.url, basket(100), format='json')
+
+        self.assertEqual(len(one_line), len(hundred_lines))
+
+    def test_sale_query_count_does_not_grow_with_batch_count(self):
+        few = create_stocked_product(batch_count=5, name="Few batches")
+        many = create_stocked_product(batch_count=50, name="Many batches")
+
+        with CaptureQueriesContext(connection) as few_queries:
+            self.sell(few, 45)
+        with CaptureQueriesContext(connection) as many_queries:
+            self.sell(many, 495)
+
+        self.assertEqual(len(few_queries), len(many_queries))
+        many.refresh_from_db()
+        self.assertEqual(many.total_quantity, 5)
+
+
+class TotalQuantityMaintenanceTests(TestCase):
+
+    def test_batch_writes_apply_deltas(self):
+        product = create_stocked_product(batch_count=0)
+
+        batch = ProductBatch.objects.create(product=product, quantity=12, cost_price=Decimal("4.00"))
+        ProductBatch.objects.create(product=product, quantity=3, cost_price=Decimal("4.50"))
+        product.refresh_from_db()
+        self.assertEqual(product.total_quantity, 15)
+
+        batch = ProductBatch.objects.get(pk=batch.pk)
+        batch.quantity = 7
+        batch.save()
+        product.refresh_from_db()
+        self.assertEqual(product.total_quantity, 10)
+
+        batch.delete()
+        product.refresh_from_db()
+        self.assertEqual(product.total_quantity, 3)
+
+    def test_repair_command_fixes_drift(self):
+        product = create_stocked_product(batch_count=4)
+        Product.objects.filter(pk=product.pk).update(total_quantity=999)
+
+        call_command('repair_total_quantity', stdout=StringIO())
+
+        product.refresh_from_db()
+        self.assertEqual(product.total_quantity, 40)
+
+
+class BatchCompactionTests(TestCase):
+
+    def test_sold_out_batches_are_archived(self):
+        product = create_stocked_product(batch_count=3)
+
+        APIClient().post(reverse('sell-product'), {"products": [{
+            "product_id": product.pk, "unit_type": "piece", "quantity": 15, "selling_price": "8.00",
+        }]}, format='json')
+
+        [archived] = ProductBatchArchive.objects.filter(product=product)
+        self.assertEqual((archived.reason, archived.quantity, archived.cost_price), ("depleted", 10, Decimal("5.00")))
+
+    def test_merges_adjacent_batches_with_the_same_cost(self):
+        product = create_stocked_product(batch_count=0)
+        ProductBatch.objects.bulk_create([
+            ProductBatch(product=product, quantity=quantity, cost_price=Decimal(cost))
+            for quantity, cost in [(3, "5.00"), (4, "5.00"), (0, "6.00"), (5, "5.00"), (6, "7.00"), (2, "7.00")]
+        ])
+        Product.objects.filter(pk=product.pk).update(total_quantity=20)
+
+        call_command('compact_batches', stdout=StringIO())
+
+        live = list(ProductBatch.objects.filter(product=product).order_by('added_on', 'id')
+                    .values_list('quantity', 'cost_price'))
+        self.assertEqual(live, [(12, Decimal("5.00")), (8, Decimal("7.00"))])
+        self.assertEqual(ProductBatchArchive.objects.filter(reason="merged").count(), 3)
+        self.assertEqual(ProductBatchArchive.objects.filter(reason="depleted").count(), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.total_quantity, 20)
+
+        output = StringIO()
+        call_command('batch_fanout', stdout=output)
+        self.assertIn("2 batch(es), 0 sold out, 20 unit(s)", output.getvalue())
+
+
+class HotQueryIndexTests(TestCase):
+
+    def test_hot_queries_use_indexes(self):
+        out = StringIO()
+        call_command('explain_hot_queries', '--seed-products', '50', stdout=out)
+
+        self.assertIn("Every hot query uses an index.", out.getvalue())
+        self.assertFalse(Product.objects.exists())
+
+
+class BulkAddProductQuantityTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('bulk-add-product-quantity')
+
+    def test_reports_partial_failures_per_line(self):
+        first = create_stocked_product(batch_count=1, name="First")
+        second = create_stocked_product(batch_count=0, name="Second")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, [
+                {"product_id": first.pk, "quantity": 5, "cost_price": "3.00"},
+                {"product_id": 987654, "quantity": 5, "cost_price": "3.00"},
+                {"product_id": second.pk, "quantity": 0, "cost_price": "3.00"},
+                {"product_id": second.pk, "quantity": 7, "cost_price": "3.50"},
+                {"product_id": first.pk, "quantity": 2, "cost_price": "3.10"},
+            ], format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([r['status'] for r in response.data['results']],
+                         ["created", "error", "error", "created", "created"])
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.total_quantity, 17)
+        self.assertEqual(second.total_quantity, 7)
+        # product lookup, batch and ledger inserts, catalogue version and total_quantity updates,
+        # low-stock check, plus the transaction savepoint
+        self.assertLessEqual(len(queries), 8)
+
+    def test_accepts_ndjson(self):
+        product = create_stocked_product(batch_count=0)
+        body = "\n".join([
+            f'{{"product_id": {product.pk}, "quantity": 4, "cost_price": "2.00"}}',
+            f'{{"product_id": {product.pk}, "quantity": 6, "cost_price": "2.50"}}',
+        ])
+
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, 201)
+        product.refresh_from_db()
+        self.assertEqual(product.total_quantity, 10)
+
+
+class IdempotencyKeyTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.product = create_stocked_product(batch_count=3)
+        self.basket = {"products": [{
+            "product_id": self.product.pk, "unit_type": "piece", "quantity": 4, "selling_price": "8.00",
+        }]}
+
+    def test_retried_sale_replays_the_original_response(self):
+        first = self.client.post(reverse('sell-product'), self.basket, format='json', HTTP_IDEMPOTENCY_KEY="sale-1")
+
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.client.post(reverse('sell-product'), self.basket, format='json', HTTP_IDEMPOTENCY_KEY="sale-1")
+
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(SalesRecord.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.total_quantity, 26)
+
+    def test_retried_add_quantity_adds_one_batch(self):
+        url = f"/api/products/{self.product.pk}/add-quantity/"
+        payload = {"quantity": 5, "cost_price": "9.00"}
+
+        for _ in range(2):
+            response = self.client.post(url, payload, format='json', HTTP_IDEMPOTENCY_KEY="restock-1")
+            self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(ProductBatch.objects.filter(product=self.product).count(), 4)
+
+    def test_key_reused_for_a_different_request_is_rejected(self):
+        self.client.post(reverse('sell-product'), self.basket, format='json', HTTP_IDEMPOTENCY_KEY="sale-1")
+        self.basket["products"][0]["quantity"] = 5
+
+        response = self.client.post(reverse('sell-product'), self.basket, format='json', HTTP_IDEMPOTENCY_KEY="sale-1")
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(SalesRecord.objects.count(), 1)
+
+    def test_failed_requests_are_not_stored(self):
+        self.basket["products"][0]["quantity"] = 100
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductBatch.objects.filter(product=self.product).delete()
+
+        response = self.client.post(reverse('sell-product'), self.basket, format='json', HTTP_IDEMPOTENCY_KEY="sale-1")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_purge_removes_expired_responses(self):
+        self.client.post(reverse('sell-product'), self.basket, format='json', HTTP_IDEMPOTENCY_KEY="sale-1")
+        self.client.post(reverse('sell-product'), self.basket, format='json', HTTP_IDEMPOTENCY_KEY="sale-2")
+        IdempotencyKey.objects.filter(key="sale-1").update(created_at=timezone.now() - timedelta(days=2))
+
+        call_command('purge_idempotency_keys', stdout=StringIO())
+
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ["sale-2"])
+
+
+class InventoryValuationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('inventory-valuation')
+
+    def test_values_stock_at_cost_in_one_query(self):
+        product = create_stocked_product(batch_count=2)  # 10 @ 5.00 + 10 @ 6.00
+        ProductBatch.objects.create(product=create_stocked_product(batch_count=0, name="Rice"),
+                                    quantity=4, cost_price=Decimal("2.50"))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url + "?group_by=product&fresh=true")
+
+        self.assertEqual(response.data['total_value'], Decimal("120.00"))
+        self.assertEqual(response.data['total_quantity'], 24)
+        first = response.data['products'][0]
+        self.assertEqual((first['product_id'], first['average_cost']), (product.pk, Decimal("5.50")))
+
+    def test_cached_snapshot_is_dropped_by_batch_writes(self):
+        product = create_stocked_product(batch_count=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.get(self.url).data['total_value'], Decimal("50.00"))
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductBatch.objects.create(product=product, quantity=1, cost_price=Decimal("7.00"))
+
+        [drugs] = self.client.get(self.url).data['categories']
+        self.assertEqual((drugs['category'], drugs['value']), ("drugs", Decimal("57.00")))
+
+
+class ConcurrentSellTests(TransactionTestCase):
+
+    THREADS = 8
+    SALES_PER_THREAD = 30
+
+    def test_overlapping_sales_never_oversell(self):
+        products = [create_stocked_product(batch_count=20, name=f"Product {i}") for i in range(3)]
+        stock = {product.pk: 200 for product in products}
+        url = reverse('sell-product')
+        errors = []
+
+        def sell_many(offset):
+            client = APIClient()
+            try:
+                for i in range(self.SALES_PER_THREAD):
+                    # Baskets list products in different orders to exercise lock ordering
+                    basket = products[(offset + i) % 3:] + products[:(offset + i) % 3]
+                    response = client.post(url, {"products": [
+                        {"product_id": p.pk, "unit_type": "piece", "quantity": 3, "selling_price": "8.00"}
+                        for p in basket
+                    ]}, format='json')
+                    if response.status_code not in (200, 400):
+                        errors.append(response.status_code)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=sell_many, args=(n,)) for n in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertFalse(ProductBatch.objects.filter(quantity__lt=0).exists())
+        for product in products:
+            product.refresh_from_db()
+            sold = SalesRecord.objects.filter(product=product).aggregate(
+                quantity=Sum('quantity'), revenue=Sum('revenue'), cost=Sum('cost'), profit=Sum('profit'))
+            on_hand = ProductBatch.objects.filter(product=product).aggregate(total=Sum('quantity'))['total'] or 0
+
+            self.assertGreaterEqual(product.total_quantity, 0)
+            self.assertEqual(product.total_quantity, on_hand)
+            self.assertEqual(sold['quantity'] + on_hand, stock[product.pk])
+            self.assertEqual(sold['revenue'], sold['quantity'] * Decimal("8.00"))
+            self.assertEqual(sold['revenue'] - sold['cost'], sold['profit'])
+            # Batches are 10 units at 5.00, 6.00, ... so the sold units must have cost exactly
+            # what the oldest `sold` units of the ledger cost
+            expected_cost = sum(Decimal(5 + unit // 10) for unit in range(sold['quantity']))
+            self.assertEqual(sold['cost'], expected_cost)
+
+    @skipUnless(connection.vendor == 'postgresql', "SQLite has no row locks to order, and its shared in-memory "
+                "test database fails concurrent writers instead of making them wait")
+    def test_sales_and_reorder_level_changes_do_not_deadlock(self):
+        product = create_stocked_product(batch_count=20)
+        errors = []
+
+        def run(request):
+            client = APIClient()
+            try:
+                for i in range(self.SALES_PER_THREAD):
+                    response = request(client, i)
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        def sell(client, i):
+            return client.post(reverse('sell-product'), {"products": [
+                {"product_id": product.pk, "unit_type": "piece", "quantity": 1, "selling_price": "8.00"}
+            ]}, format='json')
+
+        def set_reorder_level(client, i):
+            return client.put(reverse('reorder-level', args=[product.pk]), {"reorder_level": i % 7}, format='json')
+
+        threads = [threading.Thread(target=run, args=(request,))
+                   for request in [sell, set_reorder_level] * (self.THREADS // 2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        product.refresh_from_db()
+        self.assertEqual(product.total_quantity, 200 - self.SALES_PER_THREAD * self.THREADS // 2)
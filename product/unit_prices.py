@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+from django.core.cache import cache
+from django.db import transaction
+from .models import UnitMeasurement
+
+# Entries in this process are trusted for LOCAL_TTL seconds, which bounds how long
+# another worker's edit can go unseen; edits made in this process drop them at once.
+LOCAL_TTL = 30
+# Products kept in this process; the least recently used are evicted beyond it
+LOCAL_MAX_ENTRIES = 10_000
+
+# Also share entries between workers through the configured cache backend.
+USE_SHARED_CACHE = False
+SHARED_TTL = 300
+SHARED_CACHE_KEY = 'unit-prices:{}'
+
+_local = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def _local_get(product_id, now):
+    with _local_lock:
+        entry = _local.get(product_id)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del _local[product_id]
+            return None
+        _local.move_to_end(product_id)
+        return entry[1]
+
+
+def _local_set(entries, now):
+    with _local_lock:
+        for product_id, units in entries.items():
+            _local[product_id] = (now + LOCAL_TTL, units)
+            _local.move_to_end(product_id)
+        while len(_local) > LOCAL_MAX_ENTRIES:
+            _local.popitem(last=False)
+
+
+def get_unit_prices(product_ids):
+    """
+    Return `{product_id: {unit_type: selling_price}}` for the given products,
+    loading whatever is not cached with a single query.
+    """
+    product_ids = set(product_ids)
+    now = time.monotonic()
+    prices = {}
+
+    for product_id in product_ids:
+        units = _local_get(product_id, now)
+        if units is not None:
+            prices[product_id] = units
+
+    missing = product_ids - prices.keys()
+    if missing and USE_SHARED_CACHE:
+        shared = cache.get_many([SHARED_CACHE_KEY.format(product_id) for product_id in missing])
+        found = {}
+        for product_id in missing:
+            units = shared.get(SHARED_CACHE_KEY.format(product_id))
+            if units is not None:
+                found[product_id] = units
+        _local_set(found, now)
+        prices.update(found)
+        missing = product_ids - prices.keys()
+
+    if missing:
+        loaded = {product_id: {} for product_id in missing}
+        rows = UnitMeasurement.objects.filter(product_id__in=missing).values_list(
+            'product_id', 'unit_type', 'selling_price')
+        for product_id, unit_type, selling_price in rows:
+            loaded[product_id][unit_type] = selling_price
+
+        _local_set(loaded, now)
+        if USE_SHARED_CACHE:
+            cache.set_many({SHARED_CACHE_KEY.format(product_id): units for product_id, units in loaded.items()},
+                           SHARED_TTL)
+        prices.update(loaded)
+
+    return prices
+
+
+def _forget(product_ids):
+    with _local_lock:
+        for product_id in product_ids:
+            _local.pop(product_id, None)
+    if USE_SHARED_CACHE:
+        cache.delete_many([SHARED_CACHE_KEY.format(product_id) for product_id in product_ids])
+
+
+def invalidate_unit_prices(product_ids):
+    """
+    Drop cached unit prices for these products now and again once the current
+    transaction commits, so a read racing the write cannot re-cache old prices.
+    """
+    product_ids = list(product_ids)
+    _forget(product_ids)
+    transaction.on_commit(lambda: _forget(product_ids))
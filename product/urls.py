@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
@@ -22,10 +22,26 @@ schema_view = get_schema_view(
 urlpatterns = [
     path('products/', views.ProductListCreateView.as_view(), name='product-list-create'),
     path('products/<int:pk>/', views.ProductRetrieveView.as_view(), name='single-product'),
+    path('products/search/', views.ProductSearchView.as_view(), name='product-search'),
+    path('products/low-stock/', views.LowStockView.as_view(), name='low-stock'),
+    path('products/low-stock/events/', views.LowStockEventsView.as_view(), name='low-stock-events'),
+    path('products/<int:pk>/reorder-level/', views.ReorderLevelView.as_view(), name='reorder-level'),
+    path('products/import/', views.ImportProductsView.as_view(), name='import-products'),
+    path('products/add-quantity/bulk/', views.BulkAddProductQuantityView.as_view(), name='bulk-add-product-quantity'),
     path('products/<int:product_id>/add-quantity/', views.AddProductQuantityView.as_view(), name='add-product-quantity'),
     path('products/<int:pk>/product-batches/', views.ProductBatchesRetrieveView.as_view(), name='add-product-quantity'),
     path('products/sell/', views.SellProductView.as_view(), name='sell-product'),
     path('sales-history/', views.SalesHistoryView.as_view(), name='sales-history'),
+    path('sales-history/export/', views.SalesExportView.as_view(), name='sales-export'),
+    path('reports/inventory-valuation/', views.InventoryValuationView.as_view(), name='inventory-valuation'),
+    path('reports/sales/', views.SalesReportView.as_view(), name='sales-report'),
+    path('reports/sales-velocity/', views.SalesVelocityView.as_view(), name='sales-velocity'),
+    path('reports/stock-history/', views.StockHistoryView.as_view(), name='stock-history'),
+    # Async-native mirrors of the read endpoints, for ASGI deployments
+    path('async/products/', async_views.AsyncProductListView.as_view(), name='async-product-list'),
+    path('async/products/<int:pk>/', async_views.AsyncProductRetrieveView.as_view(), name='async-single-product'),
+    path('async/products/<int:pk>/product-batches/', async_views.AsyncProductBatchesView.as_view(), name='async-product-batches'),
+    path('async/sales-history/', async_views.AsyncSalesHistoryView.as_view(), name='async-sales-history'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
 ]
\ No newline at end of file
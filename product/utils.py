@@ -1,7 +1,404 @@
-from django.db.models import Sum
-from .models import ProductBatch
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.db import OperationalError, connection, transaction
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from .models import CatalogueVersion, LowStockEvent, Product, ProductBatch, ProductBatchArchive, StockMovement
+from .valuation import invalidate_inventory_valuation
+
+_total_quantity_sync = threading.local()
+
+# SQLite has no row locks, so sales on it take this process-wide writer lock instead.
+_sqlite_sale_lock = threading.Lock()
+
+SALE_RETRY_ATTEMPTS = 5
+SALE_RETRY_BACKOFF = 0.05
+
+
+@contextmanager
+def total_quantity_sync_suspended():
+    """
+    Mute the ProductBatch signals that keep Product.total_quantity and the
+    stock ledger in step, for callers that adjust the total themselves in a
+    single statement and append their own StockMovements in bulk.
+    """
+    previous = getattr(_total_quantity_sync, 'suspended', False)
+    _total_quantity_sync.suspended = True
+    try:
+        yield
+    finally:
+        _total_quantity_sync.suspended = previous
+
+
+def total_quantity_sync_is_suspended():
+    return getattr(_total_quantity_sync, 'suspended', False)
+
+
+def _move_catalogue_version():
+    now = timezone.now()
+    if not CatalogueVersion.objects.filter(pk=1).update(version=F('version') + 1, updated_at=now):
+        CatalogueVersion.objects.get_or_create(pk=1, defaults={'version': 1, 'updated_at': now})
+
+
+def bump_catalogue_version():
+    """
+    Move the catalogue's version once the current transaction commits, as a
+    statement of its own. Taking the row lock inside the writing transaction
+    would serialize every sale on it, and could deadlock against writers that
+    lock products in a different order. A read that lands between the commit
+    and the bump may pair the new data with the old version for that moment.
+    """
+    transaction.on_commit(_move_catalogue_version, robust=True)
+
+
+def version_bump():
+    """
+    Update kwargs that mark a product as changed for HTTP cache validation.
+    The catalogue's version moves with it after commit.
+    """
+    bump_catalogue_version()
+    return {'version': F('version') + 1, 'updated_at': timezone.now()}
+
+
+def bump_product_versions(product_ids):
+    Product.objects.filter(pk__in=product_ids).update(**version_bump())
+
+
+def adjust_total_quantity(product_id, delta):
+    """
+    Apply a batch write to Product.total_quantity as an atomic delta, touching only that column
+    and the product's version.
+    """
+    if delta:
+        Product.objects.filter(pk=product_id).update(
+            total_quantity=F('total_quantity') + delta, **version_bump())
+        invalidate_inventory_valuation()
+        sync_low_stock([product_id])
+
+
+def adjust_total_quantities(deltas):
+    """
+    Apply `{product_id: delta}` to many products' total_quantity in a single UPDATE.
+    """
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if deltas:
+        Product.objects.filter(pk__in=deltas).update(
+            total_quantity=F('total_quantity') + Case(
+                *[When(pk=product_id, then=Value(delta)) for product_id, delta in deltas.items()],
+                default=Value(0),
+            ),
+            **version_bump()
+        )
+        invalidate_inventory_valuation()
+        sync_low_stock(deltas)
+
+
+def bulk_add_batches(entries):
+    """
+    Receive validated `{product_id, quantity, cost_price}` entries with one
+    bulk insert and one total_quantity update for all affected products.
+    """
+    batches = ProductBatch.objects.bulk_create([
+        ProductBatch(product_id=entry['product_id'],
+                     quantity=entry['quantity'],
+                     cost_price=entry['cost_price'])
+        for entry in entries
+    ])
+    StockMovement.objects.bulk_create([StockMovement.for_batch(batch, 'receipt', batch.quantity) for batch in batches])
+
+    deltas = defaultdict(int)
+    for entry in entries:
+        deltas[entry['product_id']] += entry['quantity']
+    adjust_total_quantities(deltas)
+
+    return batches
+
 
 def compute_total_quantity(product):
     total_quantity = ProductBatch.objects.filter(product=product).aggregate(total=Sum('quantity'))['total'] or 0
     product.total_quantity = total_quantity
-    product.save()
\ No newline at end of file
+    Product.objects.filter(pk=product.pk).update(total_quantity=total_quantity, **version_bump())
+    invalidate_inventory_valuation()
+    sync_low_stock([product.pk])
+
+
+# Low-stock events are only served once they are this old. An event's id is
+# drawn when it is inserted, not when its transaction commits, so a later id
+# can become visible first; waiting lets every transaction that inserted an
+# earlier event commit before a reader's cursor moves past it.
+LOW_STOCK_EVENT_SETTLE_TIME = timedelta(seconds=5)
+
+
+def is_low_stock():
+    return Q(reorder_level__gt=0, total_quantity__lte=F('reorder_level'))
+
+
+def sync_low_stock(product_ids):
+    """
+    Bring low_stock_since in line with total_quantity for these products and
+    record a LowStockEvent for each that crossed its reorder level. Costs one
+    indexed read when nothing crossed, which is almost always.
+    """
+    crossed = list(Product.objects.filter(pk__in=list(product_ids)).filter(
+        (is_low_stock() & Q(low_stock_since__isnull=True))
+        | (~is_low_stock() & Q(low_stock_since__isnull=False))
+    ).values_list('id', 'total_quantity', 'reorder_level', 'low_stock_since'))
+    if not crossed:
+        return
+
+    now = timezone.now()
+    low = [product_id for product_id, _, _, since in crossed if since is None]
+    restocked = [product_id for product_id, _, _, since in crossed if since is not None]
+    if low:
+        Product.objects.filter(pk__in=low).update(low_stock_since=now)
+    if restocked:
+        Product.objects.filter(pk__in=restocked).update(low_stock_since=None)
+    LowStockEvent.objects.bulk_create([
+        LowStockEvent(product_id=product_id, event='restocked' if since else 'low',
+                      total_quantity=total_quantity, reorder_level=reorder_level)
+        for product_id, total_quantity, reorder_level, since in crossed
+    ])
+
+
+def _batch_total_subquery():
+    batch_totals = (ProductBatch.objects.filter(product=OuterRef('pk'))
+                    .values('product')
+                    .annotate(total=Sum('quantity'))
+                    .values('total'))
+    return Coalesce(Subquery(batch_totals), 0)
+
+
+def find_total_quantity_drift(product_ids=None):
+    """
+    Return `(id, product_name, stored, actual)` for every product whose
+    total_quantity no longer matches the sum of its batches.
+    """
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    return list(products.annotate(actual=_batch_total_subquery())
+                .exclude(total_quantity=F('actual'))
+                .order_by('pk')
+                .values_list('id', 'product_name', 'total_quantity', 'actual'))
+
+
+def repair_total_quantities(product_ids=None):
+    """
+    Recompute total_quantity from the batches for drifted products in a single UPDATE.
+    Returns the drift that was found.
+    """
+    drift = find_total_quantity_drift(product_ids)
+    if drift:
+        Product.objects.filter(pk__in=[row[0] for row in drift]).update(
+            total_quantity=_batch_total_subquery(), **version_bump()
+        )
+        sync_low_stock([row[0] for row in drift])
+    return drift
+
+
+@dataclass
+class FifoAllocation:
+    """
+    How a sale is drawn from a product's batches: the batches it empties,
+    the one it leaves partially consumed, and what the drawn units cost.
+    `draws` lists `(batch_id, quantity, cost_price)` for every batch touched.
+    """
+    consumed_batch_ids: list = field(default_factory=list)
+    partial_batch_id: int = None
+    partial_remaining: int = 0
+    quantity: int = 0
+    cost: Decimal = Decimal(0)
+    draws: list = field(default_factory=list)
+
+
+def lock_products_for_sale(product_ids):
+    """
+    Lock and load every product in a basket with one query, always locking in
+    ascending id order so two baskets sharing products cannot deadlock each other.
+    Returns `{product_id: Product}`; ids that do not exist are simply absent.
+    """
+    products = (Product.objects.select_for_update()
+                .filter(pk__in=set(product_ids))
+                .order_by('pk'))
+    return {product.pk: product for product in products}
+
+
+def run_sale_transaction(func):
+    """
+    Run `func` in its own transaction, retrying with bounded, jittered backoff
+    when the database reports a serialization failure, deadlock or busy lock.
+    """
+    for attempt in range(1, SALE_RETRY_ATTEMPTS + 1):
+        writer_lock = _sqlite_sale_lock if connection.vendor == 'sqlite' else nullcontext()
+        try:
+            with writer_lock, transaction.atomic():
+                return func()
+        except OperationalError:
+            if attempt == SALE_RETRY_ATTEMPTS or connection.in_atomic_block:
+                raise
+        time.sleep(SALE_RETRY_BACKOFF * 2 ** (attempt - 1) * random.uniform(1, 1.5))
+
+
+def plan_fifo_depletion(batches, quantity):
+    """
+    Walk `(id, quantity, cost_price)` rows oldest first and plan how
+    `quantity` units are taken from them. Nothing is written here.
+    """
+    allocation = FifoAllocation()
+
+    for batch_id, batch_quantity, cost_price in batches:
+        if quantity == 0:
+            break
+
+        if batch_quantity <= quantity:
+            # The whole batch is sold
+            allocation.consumed_batch_ids.append(batch_id)
+            allocation.draws.append((batch_id, batch_quantity, cost_price))
+            allocation.cost += batch_quantity * cost_price
+            allocation.quantity += batch_quantity
+            quantity -= batch_quantity
+        else:
+            # Only part of the batch is sold
+            allocation.partial_batch_id = batch_id
+            allocation.partial_remaining = batch_quantity - quantity
+            allocation.draws.append((batch_id, quantity, cost_price))
+            allocation.cost += quantity * cost_price
+            allocation.quantity += quantity
+            quantity = 0
+
+    return allocation
+
+
+def load_fifo_batches(product_ids):
+    """
+    Lock and read the batches of every product in a basket with one query.
+    Returns `{product_id: [(id, quantity, cost_price), ...]}`, oldest first.
+    """
+    batches = {product_id: [] for product_id in product_ids}
+    rows = (ProductBatch.objects.select_for_update()
+            .filter(product_id__in=batches)
+            .order_by('product_id', 'added_on', 'id')
+            .values_list('product_id', 'id', 'quantity', 'cost_price'))
+    for product_id, *batch in rows:
+        batches[product_id].append(tuple(batch))
+    return batches
+
+
+def remaining_batches(batches, allocation):
+    """
+    The batches left once `allocation` has been taken from them, so a product
+    that appears twice in a basket carries on from where its first line stopped.
+    """
+    remaining = batches[len(allocation.consumed_batch_ids):]
+    if allocation.partial_batch_id is not None:
+        batch_id, _, cost_price = remaining[0]
+        remaining[0] = (batch_id, allocation.partial_remaining, cost_price)
+    return remaining
+
+
+def apply_fifo_depletions(allocations):
+    """
+    Write a basket's `(product_id, FifoAllocation)` plans back in a fixed
+    number of statements, however many lines and batches are involved: the
+    emptied batches are archived and deleted in bulk, the partial ones are
+    updated in bulk, every draw is appended to the stock ledger in bulk and
+    every product touched gets one total_quantity adjustment.
+    """
+    consumed = set()
+    partial = {}
+    deltas = defaultdict(int)
+    movements = []
+
+    for product_id, allocation in allocations:
+        movements += [StockMovement(product_id=product_id, batch_id=batch_id, kind='sale',
+                                    quantity=-quantity, cost_price=cost_price)
+                      for batch_id, quantity, cost_price in allocation.draws]
+        consumed.update(allocation.consumed_batch_ids)
+        if allocation.partial_batch_id is not None:
+            partial[allocation.partial_batch_id] = allocation.partial_remaining
+        deltas[product_id] -= allocation.quantity
+
+    # A batch left partial by one line may have been emptied by a later line
+    for batch_id in consumed:
+        partial.pop(batch_id, None)
+
+    with total_quantity_sync_suspended():
+        if consumed:
+            archive_batches(ProductBatch.objects.filter(pk__in=consumed), 'depleted')
+            ProductBatch.objects.filter(pk__in=consumed).delete()
+        if partial:
+            ProductBatch.objects.bulk_update(
+                [ProductBatch(pk=batch_id, quantity=quantity) for batch_id, quantity in partial.items()],
+                ['quantity'],
+            )
+    StockMovement.objects.bulk_create(movements)
+
+    adjust_total_quantities(deltas)
+
+
+def archive_batches(batches, reason, merged_into=None):
+    """
+    Copy batches into ProductBatchArchive before they leave the live table.
+    `merged_into` maps a batch id to the batch that absorbed its units.
+    """
+    merged_into = merged_into or {}
+    ProductBatchArchive.objects.bulk_create([
+        ProductBatchArchive.from_batch(batch, reason, merged_into.get(batch.pk)) for batch in batches
+    ])
+
+
+def parse_date_bound(value, param, end=False):
+    """
+    Parse a `YYYY-MM-DD` or ISO datetime query parameter into an aware datetime.
+    A bare date used as an upper bound means the whole of that day, so it
+    becomes midnight of the next day and callers compare with `__lt`.
+    """
+    try:
+        moment = parse_datetime(value)
+        day = parse_date(value) if moment is None else None
+    except ValueError:
+        moment = day = None
+    if moment is None:
+        if day is None:
+            raise ValidationError({param: [f"'{value}' is not a valid date or datetime."]})
+        moment = datetime.combine(day + timedelta(days=1) if end else day, datetime.min.time())
+    elif end:
+        moment += timedelta(microseconds=1)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def filter_by_date_range(queryset, params, field, start_param='date_from', end_param='date_to'):
+    """
+    Apply `date_from`/`date_to` query parameters as a half-open range on `field`,
+    comparing the column directly so the filter can use its index.
+    """
+    if params.get(start_param):
+        queryset = queryset.filter(**{f'{field}__gte': parse_date_bound(params[start_param], start_param)})
+    if params.get(end_param):
+        queryset = queryset.filter(**{f'{field}__lt': parse_date_bound(params[end_param], end_param, end=True)})
+    return queryset
+
+
+def filter_sales(queryset, params):
+    """
+    Narrow a SalesRecord queryset by the `product`, `unit_type`, `date_from` and `date_to` query parameters.
+    """
+    if params.get('product'):
+        try:
+            queryset = queryset.filter(product_id=int(params['product']))
+        except ValueError:
+            raise ValidationError({'product': ["A valid integer is required."]})
+    if params.get('unit_type'):
+        queryset = queryset.filter(unit_type=params['unit_type'])
+    return filter_by_date_range(queryset, params, 'sale_date')
@@ -0,0 +1,87 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum
+from .models import ProductBatch
+
+VALUATION_GROUPS = ('category', 'product')
+
+# Each worker has its own cache unless a shared backend is configured, so the
+# timeout bounds how stale another worker's snapshot can be.
+VALUATION_CACHE_TIMEOUT = 60
+VALUATION_CACHE_KEY = 'inventory-valuation:{}'
+
+CENT = Decimal('0.01')
+
+
+def product_stock_values():
+    """
+    Quantity on hand and its value at cost for every product with stock, as one grouped query over the batches.
+    """
+    return (ProductBatch.objects
+            .values('product_id', product_name=F('product__product_name'), category=F('product__category'))
+            .annotate(stock_quantity=Sum('quantity'),
+                      stock_value=Sum(F('quantity') * F('cost_price'),
+                                      output_field=DecimalField(max_digits=20, decimal_places=2)))
+            .filter(stock_quantity__gt=0)
+            .order_by('product_id'))
+
+
+def compute_inventory_valuation(group_by='category'):
+    """
+    Value the stock on hand at cost: the overall total plus a breakdown per
+    category or per product. The per-product average cost is weighted by what
+    is left in each batch, i.e. what FIFO will charge for the remaining units.
+    """
+    total_quantity = 0
+    total_value = Decimal(0)
+    categories = defaultdict(lambda: {"quantity": 0, "value": Decimal(0)})
+    products = []
+
+    for row in product_stock_values():
+        total_quantity += row['stock_quantity']
+        total_value += row['stock_value']
+        if group_by == 'product':
+            products.append({
+                "product_id": row['product_id'],
+                "product_name": row['product_name'],
+                "category": row['category'],
+                "quantity": row['stock_quantity'],
+                "value": row['stock_value'],
+                "average_cost": (row['stock_value'] / row['stock_quantity']).quantize(CENT),
+            })
+        else:
+            category = categories[row['category']]
+            category["quantity"] += row['stock_quantity']
+            category["value"] += row['stock_value']
+
+    valuation = {"total_quantity": total_quantity, "total_value": total_value}
+    if group_by == 'product':
+        valuation["products"] = products
+    else:
+        valuation["categories"] = [
+            {"category": name, **totals} for name, totals in sorted(categories.items())
+        ]
+    return valuation
+
+
+def inventory_valuation(group_by='category', use_cache=True):
+    """
+    The valuation from the cached snapshot when there is one, computing and storing it otherwise.
+    """
+    if not use_cache:
+        return compute_inventory_valuation(group_by)
+    return cache.get_or_set(VALUATION_CACHE_KEY.format(group_by),
+                            lambda: compute_inventory_valuation(group_by),
+                            VALUATION_CACHE_TIMEOUT)
+
+
+def invalidate_inventory_valuation():
+    """
+    Drop the cached snapshots once the current transaction commits, so a
+    concurrent read cannot re-cache the value from before the write.
+    """
+    transaction.on_commit(
+        lambda: cache.delete_many([VALUATION_CACHE_KEY.format(group) for group in VALUATION_GROUPS])
+    )
@@ -2,55 +2,314 @@ from rest_framework import generics
 from rest_framework.views import APIView
 from rest_framework import status
 from rest_framework.response import Response
+from rest_framework.exceptions import UnsupportedMediaType
+from rest_framework.parsers import JSONParser
+from rest_framework.settings import api_settings
 from django.shortcuts import get_object_or_404
 from django.db import transaction
-from .models import Product, ProductBatch, SalesRecord
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from .models import Product, UnitMeasurement, ProductBatch, SalesRecord, LowStockEvent
+from .analytics import sales_velocity
+from .catalogue_import import IMPORT_FORMATS, IMPORT_READERS, ImportFormatError, import_products
+from .conditional import ConditionalGetMixin, catalogue_version, product_version
+from .exports import EXPORTERS, EXPORT_CONTENT_TYPES
+from .idempotency import IdempotentPostMixin
+from .ledger import stock_history
+from .pagination import LowStockPagination, ProductPagination, SalesHistoryPagination, SearchPagination
+from .parsers import NDJSONParser
+from .read_serializers import (LowStockEventListSerializer, LowStockListSerializer,
+                               ProductBatchListSerializer, ProductListSerializer,
+                               SalesRecordListSerializer, ValuesListMixin)
+from .renderers import EventStreamRenderer
+from .search import SEARCH_MIN_PREFIX, search_products, search_terms, searchable
+from .reporting import add_sales_to_rollup, sales_report
+from .unit_prices import get_unit_prices
+from .valuation import VALUATION_GROUPS, inventory_valuation
+from .utils import (LOW_STOCK_EVENT_SETTLE_TIME, apply_fifo_depletions, bulk_add_batches,
+                    filter_by_date_range, filter_sales, load_fifo_batches,
+                    lock_products_for_sale, plan_fifo_depletion,
+                    remaining_batches, run_sale_transaction, sync_low_stock,
+                    version_bump)
 from decimal import Decimal
 from drf_yasg.utils import swagger_auto_schema
 from .serializers import (ProductSerializer,
                         AddProductQuantitySerializer,
+                        BulkAddProductQuantitySerializer,
                         RetrieveProductBatchesSerializer,
-                        SellProductSerializer, SalesRecordSerializer)
+                        SellProductSerializer, SalesRecordSerializer,
+                        LowStockProductSerializer, LowStockEventSerializer,
+                        ReorderLevelSerializer)
 # Create your views here.
 
 
-class ProductListCreateView(generics.ListCreateAPIView):
+def product_catalogue_queryset():
+    """
+    Products with their unit measurements loaded in one extra query,
+    selecting only the columns ProductSerializer renders.
+    """
+    return Product.objects.only(
+        'id', 'product_name', 'total_quantity', 'reorder_level', 'cost_price', 'category', 'timestamp'
+    ).prefetch_related(
+        Prefetch('unit_measurements',
+                 queryset=UnitMeasurement.objects.only('product_id', 'unit_type', 'selling_price'))
+    )
+
+
+def product_list_queryset(params):
+    queryset = product_catalogue_queryset()
+    if params.get('category'):
+        queryset = queryset.filter(category=params['category'])
+    return filter_by_date_range(queryset, params, 'timestamp')
+
+
+def product_batches_queryset(product_id):
+    return ProductBatch.objects.filter(product_id=product_id).only(
+        'product_id', 'quantity', 'cost_price', 'added_on')
+
+
+def sales_history_queryset(params):
+    queryset = SalesRecord.objects.select_related('product').only(
+        'product__product_name', 'unit_type', 'quantity',
+        'revenue', 'cost', 'profit', 'sale_date'
+    ).order_by('-sale_date', '-id')
+    return filter_sales(queryset, params)
+
+
+class ProductListCreateView(ConditionalGetMixin, ValuesListMixin, generics.ListCreateAPIView):
     serializer_class = ProductSerializer
-    queryset = Product.objects.all()
+    list_serializer_class = ProductListSerializer
+    pagination_class = ProductPagination
 
+    def get_queryset(self):
+        return product_list_queryset(self.request.query_params)
 
-class ProductRetrieveView(generics.RetrieveAPIView):
+    def get_version(self):
+        return catalogue_version()
+
+
+class ProductSearchView(APIView):
+    """
+    View to find products by partial name or category, best match first.
+    """
+    @swagger_auto_schema(
+        responses={200: 'Success', 400: 'Bad Request', 404: 'Invalid cursor'},
+        operation_description="Products whose name or category has words starting with every word of `q`, the first at least 3 characters long, ranked by relevance and paginated with `cursor` and `page_size` (default 20, at most 100). Served from a full-text index."
+    )
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        terms = search_terms(query)
+        if not terms:
+            return Response({"error": "Pass the words to search for in `q`."}, status=status.HTTP_400_BAD_REQUEST)
+        if not searchable(terms):
+            return Response({"error": f"Type at least {SEARCH_MIN_PREFIX} characters of the first word."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = SearchPagination()
+        hits = paginator.paginate_search(lambda position, limit: search_products(query, position, limit), request)
+        rows = ProductListSerializer.values(Product.objects.filter(pk__in=[hit['id'] for hit in hits]).order_by())
+        products = {product['id']: product for product in ProductListSerializer(list(rows)).data}
+        # A product deleted since the index was read is simply left out
+        return paginator.get_paginated_response([products[hit['id']] for hit in hits if hit['id'] in products])
+
+
+class ProductRetrieveView(ConditionalGetMixin, generics.RetrieveAPIView):
     serializer_class = ProductSerializer
-    queryset = Product.objects.all()
+    queryset = product_catalogue_queryset()
+
+    def get_version(self):
+        return product_version(self.kwargs['pk'])
 
 
-class ProductBatchesRetrieveView(generics.ListAPIView):
+class ProductBatchesRetrieveView(ConditionalGetMixin, ValuesListMixin, generics.ListAPIView):
     serializer_class = RetrieveProductBatchesSerializer
+    list_serializer_class = ProductBatchListSerializer
     
     def get_queryset(self):
-        product_id = self.kwargs['pk']
-        return ProductBatch.objects.filter(product_id=product_id)
+        return product_batches_queryset(self.kwargs['pk'])
+
+    def get_version(self):
+        return product_version(self.kwargs['pk'])
     
 
-class SalesHistoryView(generics.ListAPIView):
+class SalesHistoryView(ValuesListMixin, generics.ListAPIView):
 
     serializer_class = SalesRecordSerializer
+    list_serializer_class = SalesRecordListSerializer
+    pagination_class = SalesHistoryPagination
 
     def get_queryset(self):
-        return SalesRecord.objects.all().order_by('-sale_date')
+        return sales_history_queryset(self.request.query_params)
+
+
+class SalesExportView(APIView):
+    """
+    View to stream the sales ledger as CSV or NDJSON without holding it in memory.
+    """
+    @swagger_auto_schema(
+        responses={200: 'Streamed file', 400: 'Bad Request'},
+        operation_description="Export sales as `output=csv` (default) or `output=ndjson`. Accepts the same `product`, `unit_type`, `date_from` and `date_to` filters as the sales history."
+    )
+    def get(self, request):
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORTERS:
+            return Response({"error": f"Unsupported output '{output}'. Use one of: {', '.join(sorted(EXPORTERS))}."},
+                            status=status.HTTP_400_BAD_REQUEST)
 
+        queryset = filter_sales(SalesRecord.objects.all(), request.query_params)
+        response = StreamingHttpResponse(EXPORTERS[output](queryset), content_type=EXPORT_CONTENT_TYPES[output])
+        response['Content-Disposition'] = f'attachment; filename="sales.{output}"'
+        return response
 
-class AddProductQuantityView(APIView):
+
+class SalesReportView(APIView):
+    """
+    View to report revenue, cost and profit per product per day, week or month.
+    """
+    @swagger_auto_schema(
+        responses={200: 'Success', 400: 'Bad Request'},
+        operation_description="Sales totals per product grouped by `period` (`day`, `week` or `month`). Optional `date_from`, `date_to` (YYYY-MM-DD) and `product` filters."
+    )
+    def get(self, request):
+        return Response({
+            "period": request.query_params.get('period', 'day'),
+            "results": sales_report(request.query_params)
+        }, status=status.HTTP_200_OK)
+
+
+class SalesVelocityView(APIView):
+    """
+    View to project how many days each product's stock will last at its recent sales rate.
+    """
+    @swagger_auto_schema(
+        responses={200: 'Success', 400: 'Bad Request'},
+        operation_description="Average daily units sold, 7/28/90-day moving-average velocities, days of cover and projected stock-out date per product, soonest first. Optional `days` of history (default 90), cover `window` in days (default 28), `category`, `product`, `max_cover` and `limit` (default 100)."
+    )
+    def get(self, request):
+        return Response(sales_velocity(request.query_params), status=status.HTTP_200_OK)
+
+
+class StockHistoryView(APIView):
+    """
+    View to reconstruct stock on hand and cost of goods sold at a past moment from the stock ledger.
+    """
+    @swagger_auto_schema(
+        responses={200: 'Success', 400: 'Bad Request'},
+        operation_description="Quantity and value at cost per product at `at` (YYYY-MM-DD for the end of that day, or an ISO datetime; default now), replayed from the nearest earlier snapshot, plus the cost of goods sold from `date_from` (default the start of that day). Optional `product` filter."
+    )
+    def get(self, request):
+        return Response(stock_history(request.query_params), status=status.HTTP_200_OK)
+
+
+class InventoryValuationView(APIView):
+    """
+    View to value the stock on hand at cost, overall and per category or product.
+    """
+    @swagger_auto_schema(
+        responses={200: 'Success', 400: 'Bad Request'},
+        operation_description="Stock value at cost. `group_by=category` (default) or `group_by=product`, which adds each product's FIFO-weighted average cost. Pass `fresh=true` to bypass the cached snapshot."
+    )
+    def get(self, request):
+        group_by = request.query_params.get('group_by', 'category')
+        if group_by not in VALUATION_GROUPS:
+            return Response({"error": f"group_by must be one of: {', '.join(VALUATION_GROUPS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        use_cache = request.query_params.get('fresh', '').lower() not in ('1', 'true', 'yes')
+        return Response(inventory_valuation(group_by, use_cache=use_cache), status=status.HTTP_200_OK)
+
+
+class LowStockView(ValuesListMixin, generics.ListAPIView):
+    """
+    View to list products at or below their reorder level, longest-running shortages first.
+    """
+    serializer_class = LowStockProductSerializer
+    list_serializer_class = LowStockListSerializer
+    pagination_class = LowStockPagination
+
+    def get_queryset(self):
+        # Only rows in the partial low-stock index match
+        return Product.objects.filter(low_stock_since__isnull=False)
+
+
+class LowStockEventsView(APIView):
+    """
+    View to follow products crossing their reorder level, as JSON or Server-Sent Events.
+    """
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer]
+    page_size = 500
+
+    @swagger_auto_schema(
+        responses={200: LowStockEventSerializer(many=True), 400: 'Bad Request'},
+        operation_description="Low-stock and restock events after `after` (or the Last-Event-ID header), oldest first. "
+                              "Events are served once they are 5 seconds old, so ids never appear out of order. "
+                              "Send `Accept: text/event-stream` to consume them with EventSource."
+    )
+    def get(self, request):
+        after = request.query_params.get('after', request.headers.get('Last-Event-ID', 0))
+        try:
+            after = int(after)
+        except ValueError:
+            return Response({"after": ["A valid integer is required."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Stop short of the first event that has not settled, so the cursor never passes an id still to commit
+        events = LowStockEvent.objects.filter(pk__gt=after)
+        unsettled = (events.filter(created_at__gt=timezone.now() - LOW_STOCK_EVENT_SETTLE_TIME)
+                     .order_by('pk').values_list('pk', flat=True).first())
+        if unsettled is not None:
+            events = events.filter(pk__lt=unsettled)
+        events = LowStockEventListSerializer.values(events.order_by('pk'))[:self.page_size]
+        results = LowStockEventListSerializer(list(events)).data
+        return Response({
+            "last_event_id": results[-1]['id'] if results else after,
+            "results": results
+        }, status=status.HTTP_200_OK)
+
+
+class ReorderLevelView(APIView):
+    """
+    View to set the stock level at which a product should be reordered.
+    """
+    @swagger_auto_schema(
+        request_body=ReorderLevelSerializer,
+        responses={200: 'Success', 400: 'Bad Request', 404: 'Not Found'},
+        operation_description="Set a product's `reorder_level`; 0 turns low-stock alerting off for it."
+    )
+    def put(self, request, pk):
+        serializer = ReorderLevelSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        reorder_level = serializer.validated_data['reorder_level']
+        with transaction.atomic():
+            if not Product.objects.filter(pk=pk).update(reorder_level=reorder_level, **version_bump()):
+                raise Http404("No Product matches the given query.")
+            sync_low_stock([pk])
+            low_stock = Product.objects.filter(pk=pk, low_stock_since__isnull=False).exists()
+
+        return Response({
+            "message": f"Reorder level of product {pk} set to {reorder_level}.",
+            "reorder_level": reorder_level,
+            "low_stock": low_stock
+        }, status=status.HTTP_200_OK)
+
+
+class AddProductQuantityView(IdempotentPostMixin, APIView):
     """
     View to handle adding a new batch for existing product stock.
     """
     @swagger_auto_schema(
         request_body=AddProductQuantitySerializer,
-        responses={201: 'Created', 400: 'Bad Request'},
-        operation_description="Add quantity to an existing product. Requires `cost_price` and `quantity`."
+        responses={201: 'Created', 400: 'Bad Request', 422: 'Idempotency-Key reused'},
+        operation_description="Add quantity to an existing product. Requires `cost_price` and `quantity`. "
+                              "Send an `Idempotency-Key` header to make retries safe."
     )
 
     def post(self, request, product_id):
+        return self.run_idempotent(request, lambda: self.add_batch(request, product_id))
+
+    def add_batch(self, request, product_id):
         product = get_object_or_404(Product, pk=product_id)
         serializer = AddProductQuantitySerializer(data=request.data)
 
@@ -58,31 +317,134 @@ class AddProductQuantityView(APIView):
             new_quantity = serializer.validated_data['quantity']
             new_cost_price = serializer.validated_data['cost_price']
 
-            # Create a new batch
-            ProductBatch.objects.create(
-                product=product,
-                quantity=new_quantity,
-                cost_price=new_cost_price
-            )
-
-            return Response({
-                "message": f"New product batch added successfully for {product.product_name} with id {product_id}",
-                "quantity": new_quantity,
-                "cost_price": new_cost_price
-            }, status=status.HTTP_201_CREATED)
+            with transaction.atomic():
+                # Create a new batch
+                ProductBatch.objects.create(
+                    product=product,
+                    quantity=new_quantity,
+                    cost_price=new_cost_price
+                )
+
+                return self.remember_response(Response({
+                    "message": f"New product batch added successfully for {product.product_name} with id {product_id}",
+                    "quantity": new_quantity,
+                    "cost_price": new_cost_price
+                }, status=status.HTTP_201_CREATED))
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class SellProductView(APIView):
+class BulkAddProductQuantityView(APIView):
+    """
+    View to receive a whole shipment: many new batches, for many products, in one request.
+    """
+    parser_classes = [JSONParser, NDJSONParser]
+
+    @swagger_auto_schema(
+        request_body=BulkAddProductQuantitySerializer(many=True),
+        responses={201: 'Created', 207: 'Partially created', 400: 'Bad Request'},
+        operation_description="Add batches for many products at once. Accepts a JSON list or NDJSON of `product_id`, `quantity` and `cost_price`."
+    )
+    def post(self, request):
+        if not isinstance(request.data, list):
+            return Response({"error": "Expected a list of batches."}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = []
+        valid_entries = []
+        for line, entry in enumerate(request.data, start=1):
+            serializer = BulkAddProductQuantitySerializer(data=entry)
+            if serializer.is_valid():
+                valid_entries.append((line, serializer.validated_data))
+            else:
+                results.append({"line": line, "status": "error", "errors": serializer.errors})
+
+        # Validate every referenced product in one query
+        product_ids = {entry['product_id'] for _, entry in valid_entries}
+        existing_ids = set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+
+        to_create = []
+        for line, entry in valid_entries:
+            if entry['product_id'] not in existing_ids:
+                results.append({"line": line, "status": "error",
+                                "errors": {"product_id": [f"Product {entry['product_id']} does not exist."]}})
+                continue
+            to_create.append(entry)
+            results.append({"line": line, "status": "created", "product_id": entry['product_id'],
+                            "quantity": entry['quantity'], "cost_price": entry['cost_price']})
+
+        with transaction.atomic():
+            bulk_add_batches(to_create)
+
+        results.sort(key=lambda result: result['line'])
+        failed = len(results) - len(to_create)
+        if not to_create:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif failed:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+
+        return Response({
+            "message": f"{len(to_create)} product batch(es) added, {failed} failed.",
+            "created": len(to_create),
+            "failed": failed,
+            "results": results
+        }, status=response_status)
+
+
+class ImportProductsView(APIView):
+    """
+    View to onboard a whole supplier catalogue: products and their unit measurements, streamed as CSV or NDJSON.
+    """
+    @swagger_auto_schema(
+        responses={201: 'Created', 207: 'Partially imported', 400: 'Bad Request', 415: 'Unsupported Media Type'},
+        operation_description="Import products from a `text/csv` or `application/x-ndjson` body. "
+                              "NDJSON lines look like the body of `POST /api/products/`; CSV has `product_name`, "
+                              "`cost_price` and `category` columns plus an optional `<unit>_price` column per unit type. "
+                              "Pass `upsert=true` to update products that already exist by name."
+    )
+    def post(self, request):
+        media_type = request.content_type.split(';')[0].strip()
+        readers = {content_type: IMPORT_READERS[name] for name, content_type in IMPORT_FORMATS.items()}
+        if media_type not in readers:
+            raise UnsupportedMediaType(media_type)
+
+        # Read the body line by line rather than parsing it into request.data
+        upsert = request.query_params.get('upsert', '').lower() in ('1', 'true', 'yes')
+        try:
+            report = import_products(readers[media_type](request.stream or []), upsert=upsert)
+        except ImportFormatError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        imported = report.created + report.updated
+        if not imported:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif report.failed:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+
+        return Response({
+            "message": f"{report.created} product(s) created, {report.updated} updated, {report.failed} failed.",
+            "created": report.created,
+            "updated": report.updated,
+            "failed": report.failed,
+            "elapsed_seconds": round(report.elapsed, 3),
+            "rows_per_second": report.rows_per_second,
+            "errors": report.errors
+        }, status=response_status)
+
+
+class SellProductView(IdempotentPostMixin, APIView):
     """
     View to handle selling multiple products in one transaction.
     """
 
     @swagger_auto_schema(
         request_body=SellProductSerializer,
-        responses={200: 'Success', 400: 'Bad Request'},
-        operation_description="Sell multiple products in one transaction. Requires a list of `product_id`, `unit_type`, `quantity`, and `selling_price`."
+        responses={200: 'Success', 400: 'Bad Request', 422: 'Idempotency-Key reused'},
+        operation_description="Sell multiple products in one transaction. Requires a list of `product_id`, `unit_type`, `quantity`, and `selling_price`. "
+                              "Send an `Idempotency-Key` header to make retries safe."
     )
     def post(self, request):
         serializer = SellProductSerializer(data=request.data)
@@ -90,92 +452,94 @@ class SellProductView(APIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+        items = serializer.validated_data['products']
+        return self.run_idempotent(request, lambda: run_sale_transaction(lambda: self.process_sale(items)))
+
+    def process_sale(self, items):
+        """
+        Runs inside run_sale_transaction, so it may be retried from the top
+        if the database reports a lock conflict.
+
+        Products, unit prices and batches for the whole basket are loaded up
+        front and FIFO runs in memory, so nothing is written unless every
+        line can be sold, and a basket costs a fixed number of queries.
+        """
         total_transaction_profit = Decimal(0)
         total_revenue = Decimal(0)
         total_cost = Decimal(0)
         details = []
-
-        with transaction.atomic():
-            for product_sale_data in serializer.validated_data['products']:
-                product_id = product_sale_data['product_id']
-                unit_type = product_sale_data['unit_type']
-                quantity_to_sell = product_sale_data['quantity']
-                selling_price = product_sale_data['selling_price']
-
-                product = get_object_or_404(Product, pk=product_id)
-
-                available_unit_types = product.unit_measurements.values_list('unit_type', flat=True)
-                print(f"Available unit types for product {product.product_name}: {available_unit_types}")
-
-                # Validate the unit measurement for the product
-                unit_measurement = product.unit_measurements.filter(unit_type=unit_type,).first()
-                if not unit_measurement:
-                    return Response({"error": f"Unit type '{unit_type}' is not valid for product {product.product_name}."}, 
-                                    status=status.HTTP_400_BAD_REQUEST)
-
-                # FIFO: Get batches in order of when they were added (oldest first)
-                batches = ProductBatch.objects.filter(product=product).order_by('added_on')
-
-                product_total_cost = Decimal(0)
-                total_sold = 0
-
-                for batch in batches:
-                    if quantity_to_sell == 0:
-                        break
-
-                    if batch.quantity <= quantity_to_sell:
-                        # If the current batch can be fully sold
-                        product_total_cost += batch.quantity * batch.cost_price
-                        quantity_to_sell -= batch.quantity
-                        total_sold += batch.quantity
-
-                        # Delete the batch since it has been sold completely
-                        batch.delete()
-                    else:
-                        # If only part of the batch is sold
-                        product_total_cost += quantity_to_sell * batch.cost_price
-                        batch.quantity -= quantity_to_sell
-                        batch.save()
-
-                        total_sold += quantity_to_sell
-                        quantity_to_sell = 0
-
-                if total_sold == 0:
-                    return Response({"message": f"No products available to sell for {product.product_name}"},
-                                    status=status.HTTP_400_BAD_REQUEST)
-
-                # Calculate profit for this product sale
-                product_revenue = total_sold * selling_price
-                product_profit = product_revenue - product_total_cost
-
-                SalesRecord.objects.create(
-                    product=product,
-                    unit_type=unit_type,
-                    quantity=total_sold,
-                    revenue=product_revenue,
-                    cost=product_total_cost,
-                    profit=product_profit,
-                )
-
-                total_transaction_profit += product_profit
-                total_revenue += product_revenue
-                total_cost += product_total_cost
-
-                details.append({
-                    "product": product.product_name,
-                    "units_sold": total_sold,
-                    "unit_type": unit_type,
-                    "total_revenue": product_revenue,
-                    "total_cost": product_total_cost,
-                    "profit": product_profit
-                })
-
-            return Response({
-                "message": "Products sold successfully.",
-                "transaction_summary": {
-                    "total_revenue": total_revenue,
-                    "total_cost": total_cost,
-                    "total_profit": total_transaction_profit
-                },
-                "details": details
-            }, status=status.HTTP_200_OK)
\ No newline at end of file
+        allocations = []
+        sales = []
+
+        product_ids = [item['product_id'] for item in items]
+        products = lock_products_for_sale(product_ids)
+        unit_prices = get_unit_prices(products)
+        batches = load_fifo_batches(products)
+
+        for product_sale_data in items:
+            product_id = product_sale_data['product_id']
+            unit_type = product_sale_data['unit_type']
+            quantity_to_sell = product_sale_data['quantity']
+            selling_price = product_sale_data['selling_price']
+
+            product = products.get(product_id)
+            if product is None:
+                raise Http404("No Product matches the given query.")
+
+            # Validate the unit measurement for the product
+            if unit_type not in unit_prices[product_id]:
+                return Response({"error": f"Unit type '{unit_type}' is not valid for product {product.product_name}."}, 
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            # FIFO: plan the depletion from the oldest batches left by earlier lines
+            allocation = plan_fifo_depletion(batches[product_id], quantity_to_sell)
+            batches[product_id] = remaining_batches(batches[product_id], allocation)
+
+            product_total_cost = allocation.cost
+            total_sold = allocation.quantity
+
+            if total_sold == 0:
+                return Response({"message": f"No products available to sell for {product.product_name}"},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            # Calculate profit for this product sale
+            product_revenue = total_sold * selling_price
+            product_profit = product_revenue - product_total_cost
+
+            allocations.append((product_id, allocation))
+            sales.append(SalesRecord(
+                product=product,
+                unit_type=unit_type,
+                quantity=total_sold,
+                revenue=product_revenue,
+                cost=product_total_cost,
+                profit=product_profit,
+            ))
+
+            total_transaction_profit += product_profit
+            total_revenue += product_revenue
+            total_cost += product_total_cost
+
+            details.append({
+                "product": product.product_name,
+                "units_sold": total_sold,
+                "unit_type": unit_type,
+                "total_revenue": product_revenue,
+                "total_cost": product_total_cost,
+                "profit": product_profit
+            })
+
+        # Every line is valid: write the whole basket in bulk
+        apply_fifo_depletions(allocations)
+        sales = SalesRecord.objects.bulk_create(sales)
+        add_sales_to_rollup(sales)
+
+        return self.remember_response(Response({
+            "message": "Products sold successfully.",
+            "transaction_summary": {
+                "total_revenue": total_revenue,
+                "total_cost": total_cost,
+                "total_profit": total_transaction_profit
+            },
+            "details": details
+        }, status=status.HTTP_200_OK))